@@ -0,0 +1,468 @@
+"""Micro-benchmarks and an offline load simulation for the giveaway bot
+
+Run with `python benchmark.py <name>`; see `--help` for the options. The
+`load` benchmark drives the real scheduler, finalize pool, outbound queue
+and store against stand-ins for Discord channels and messages, and exits
+with status 1 when a --max-*/--min-* threshold is missed, so it can gate
+changes in CI.
+"""
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import discord
+
+import main
+
+
+def measure(build):
+    """Return (seconds, bytes still allocated) for building a structure"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, current
+
+
+def sample_rows(count):
+    """Rows as they come back from the giveaways table"""
+    return [
+        (
+            1_100_000_000_000_000_000 + index, 900_000_000_000_000_000 + index % 50,
+            1_700_000_000.0 + index, 1 + index % 3, f"Prize {index}", "🎉",
+            None, None, 800_000_000_000_000_000, '{"123": 2}' if index % 10 == 0 else None,
+            700_000_000_000_000_000 + index % 20, None,
+        )
+        for index in range(count)
+    ]
+
+
+def bench_records(args):
+    """Compare dict-of-dicts keyed by str ids with int-keyed Giveaway records"""
+    rows = sample_rows(args.count)
+    columns = main.GiveawayStore.COLUMNS
+
+    def as_dicts():
+        giveaways = {}
+        for row in rows:
+            giveaway = dict(zip(columns, row))
+            giveaway['bonus_roles'] = {int(key): value for key, value in json.loads(giveaway['bonus_roles'] or '{}').items()}
+            giveaways[str(giveaway['message_id'])] = giveaway
+        return giveaways
+
+    def as_records():
+        giveaways = {}
+        for row in rows:
+            giveaway = main.Giveaway.from_row(row)
+            giveaways[giveaway.message_id] = giveaway
+        return giveaways
+
+    print(f"{args.count} giveaways")
+    for name, build in (('dicts', as_dicts), ('records', as_records)):
+        elapsed, allocated = measure(build)
+        print(f"  {name:<8} load {elapsed * 1000:8.1f} ms  memory {allocated / 1024 / 1024:8.1f} MiB")
+
+
+def bench_durations(args):
+    """Compare the old single-unit duration checks with parse_duration"""
+    inputs = ['30s', '5m', '2h', '1d', '1h30m', '2w 3d', '90 minutes', '1d 12h 30m 15s']
+
+    def legacy(duration_str):
+        if 'd' in duration_str:
+            return int(duration_str.split('d')[0]) * 86400
+        elif 'h' in duration_str:
+            return int(duration_str.split('h')[0]) * 3600
+        elif 'm' in duration_str:
+            return int(duration_str.split('m')[0]) * 60
+        elif 's' in duration_str:
+            return int(duration_str.split('s')[0])
+
+    print(f"{args.count} durations")
+    for name, parse in (('legacy', legacy), ('parser', main.parse_duration)):
+        started = time.perf_counter()
+        for index in range(args.count):
+            try:
+                parse(inputs[index % len(inputs)])
+            except ValueError:
+                # The legacy checks choke on some compound inputs
+                pass
+        elapsed = time.perf_counter() - started
+        print(f"  {name:<8} {args.count / elapsed:12,.0f} parses/s  {elapsed / args.count * 1e6:6.2f} us each")
+
+
+def bench_messages(args):
+    """Per-message cost of the old on_message override and of the default handler
+
+    Nobody is configuring a giveaway, which is the case for almost every message.
+    """
+    count = args.count
+    # The override looked the author up in a dict keyed by str(user id)
+    user_states = {}
+
+    async def legacy(message):
+        if message.author.bot:
+            return
+        user_id = str(message.author.id)
+        if user_id in user_states and user_states[user_id].get('current_option'):
+            return
+        await main.bot.process_commands(message)
+
+    messages = [
+        FakeChatMessage(900_000_000_000_000_000 + index % 5000, "just chatting" if index % 50 else "+help")
+        for index in range(1000)
+    ]
+    # Commands would run for real; only the dispatch up to them is measured
+    main.bot.invoke = lambda ctx: asyncio.sleep(0)
+    main.bot._connection.user = discord.Object(1)
+
+    async def run(handler):
+        started = time.perf_counter()
+        for index in range(count):
+            await handler(messages[index % len(messages)])
+        return time.perf_counter() - started
+
+    print(f"{count} messages")
+    for name, handler in (('override', legacy), ('default', main.bot.on_message)):
+        elapsed = asyncio.run(run(handler))
+        print(f"  {name:<8} {elapsed / count * 1e6:8.2f} us per message")
+
+
+class FakeChatMessage:
+    """Just enough of a discord.Message for Bot.process_commands"""
+
+    def __init__(self, author_id, content):
+        self.author = discord.Object(author_id)
+        self.author.bot = False
+        self.content = content
+        self.guild = None
+        self.channel = None
+        self._state = None
+
+
+class FakeRest:
+    """Latency and rate limits shared by every fake REST call"""
+
+    def __init__(self, latency, rate_limit, retry_after):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.calls = 0
+        self.rate_limited = 0
+
+    async def call(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if random.random() < self.rate_limit:
+            self.rate_limited += 1
+            raise discord.RateLimited(self.retry_after)
+
+
+class FakeReaction:
+    def __init__(self, emoji, user_ids):
+        self.emoji = emoji
+        self._user_ids = user_ids
+
+    async def users(self):
+        for user_id in self._user_ids:
+            yield discord.Object(user_id)
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id, embed=None):
+        self.channel = channel
+        self.id = message_id
+        self.embeds = [embed] if embed else []
+        self.reactions = []
+
+    async def edit(self, **kwargs):
+        await self.channel.rest.call()
+        if 'embed' in kwargs:
+            self.embeds = [kwargs['embed']]
+
+    async def add_reaction(self, emoji):
+        await self.channel.rest.call()
+        self.reactions.append(FakeReaction(emoji, []))
+
+
+class FakeChannel:
+    def __init__(self, guild, channel_id, rest):
+        self.guild = guild
+        self.id = channel_id
+        self.name = f"channel-{channel_id}"
+        self.mention = f"<#{channel_id}>"
+        self.rest = rest
+        self.messages = {}
+
+    async def send(self, content=None, embed=None):
+        await self.rest.call()
+        message = FakeMessage(self, next(self.guild.snowflakes), embed)
+        self.messages[message.id] = message
+        return message
+
+    def get_partial_message(self, message_id):
+        return self.messages.get(message_id) or FakeMessage(self, message_id)
+
+    async def fetch_message(self, message_id):
+        await self.rest.call()
+        return self.messages[message_id]
+
+
+class FakeGuild:
+    def __init__(self, guild_id, channel_count, rest):
+        self.id = guild_id
+        self.snowflakes = itertools.count(guild_id + 1)
+        self.channels = {guild_id + 1_000_000 + index: None for index in range(channel_count)}
+        for channel_id in self.channels:
+            self.channels[channel_id] = FakeChannel(self, channel_id, rest)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_role(self, role_id):
+        return None
+
+    def get_member(self, user_id):
+        return None
+
+
+def bench_load(args):
+    """Create, fill and end giveaways against fake Discord objects
+
+    Returns the thresholds that were missed.
+    """
+    count = args.count or 1000
+    rest = FakeRest(args.latency, args.rate_limit, args.retry_after)
+    guild = FakeGuild(1 << 40, args.channels, rest)
+    channels = list(guild.channels.values())
+    main.bot.get_channel = lambda channel_id: guild.get_channel(channel_id)
+    main.bot.get_guild = lambda guild_id: guild if guild_id == guild.id else None
+
+    async def run():
+        with tempfile.TemporaryDirectory() as directory:
+            main.store = main.GiveawayStore(os.path.join(directory, 'giveaways.db'))
+            main.store.start()
+            results = {}
+
+            # Post every giveaway, ending spread over the window, and enter
+            # users the way reaction events add them
+            main.scheduler.start()
+            started = time.perf_counter()
+            semaphore = asyncio.Semaphore(main.BULK_CONCURRENCY)
+            user_ids = itertools.count(1)
+            entering = 0.0
+            first_end = time.time() + args.delay
+
+            async def create(index):
+                nonlocal entering
+                config = main.ConfigSession(channels[index % len(channels)].id)
+                config.duration = args.delay
+                config.prize = f"Prize {index}"
+                async with semaphore:
+                    giveaway_data = await main.start_giveaway(guild, config, 0)
+                # Durations are whole seconds; pin the exact deadline instead
+                giveaway_data.end_time = first_end + index * args.window / count
+                main.scheduler.schedule(giveaway_data.message_id, giveaway_data.end_time)
+                entered = time.perf_counter()
+                for _ in range(args.entrants):
+                    main.add_entrant(giveaway_data.message_id, next(user_ids))
+                entering += time.perf_counter() - entered
+                return giveaway_data
+
+            giveaways = await asyncio.gather(*(create(index) for index in range(count)))
+            results['create_per_second'] = count / (time.perf_counter() - started)
+            results['entrants_per_second'] = count * args.entrants / entering if entering else 0.0
+
+            # Wait for the scheduler to end them all
+            deadline = time.monotonic() + args.delay + args.window + args.timeout
+            while main.active_giveaways and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            results['unfinished'] = len(main.active_giveaways)
+            # From the first deadline to the last giveaway ended
+            span = time.time() - min(giveaway_data.end_time for giveaway_data in giveaways)
+            results['end_per_second'] = (count - results['unfinished']) / max(span, 1e-3)
+            results['lateness_mean'] = main.finalize_pool.finish_lateness.as_dict()['mean']
+            results['lateness_max'] = main.finalize_pool.finish_lateness.max
+
+            # Rerolls read the archive back from the database
+            await main.store.flush()
+            started = time.perf_counter()
+            rng, _ = main.new_draw_rng()
+            for giveaway_data in giveaways[:args.rerolls]:
+                record = await main.store.get_archive(giveaway_data.message_id)
+                main.redraw_winners(record['entrants'], 1, rng, record['cumulative'], exclude=record['winners'])
+            results['reroll_ms'] = (time.perf_counter() - started) / max(1, min(args.rerolls, count)) * 1000
+
+            await main.store.flush()
+            results['store_batches'] = main.store.write_latency.count
+            results['store_seconds'] = main.store.write_latency.sum
+            return results
+
+    tracemalloc.start()
+    results = asyncio.run(run())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results['peak_mib'] = peak / 1024 / 1024
+
+    print(f"{count} giveaways x {args.entrants} entrants in {args.channels} channels, "
+          f"{args.latency * 1000:.0f} ms REST latency, {args.rate_limit:.0%} rate limited")
+    print(f"  create       {results['create_per_second']:10,.0f} giveaways/s")
+    print(f"  entrants     {results['entrants_per_second']:10,.0f} entrants/s")
+    print(f"  end          {results['end_per_second']:10,.0f} giveaways/s  ({results['unfinished']} unfinished)")
+    print(f"  lateness     {results['lateness_mean'] * 1000:10.1f} ms mean  {results['lateness_max'] * 1000:.1f} ms max")
+    print(f"  reroll       {results['reroll_ms']:10.2f} ms each")
+    print(f"  persistence  {results['store_seconds'] * 1000:10.1f} ms in {results['store_batches']} batches")
+    print(f"  REST         {rest.calls:10,} calls  {rest.rate_limited} rate limited")
+    print(f"  peak memory  {results['peak_mib']:10.1f} MiB")
+    for stage, histogram in main.stage_latency.items():
+        print(f"  {stage:<12} {histogram.sum / histogram.count * 1000:10.2f} ms mean per call ({histogram.count} calls)")
+
+    failures = []
+    if results['unfinished']:
+        failures.append(f"{results['unfinished']} giveaways never ended")
+    if args.max_lateness is not None and results['lateness_max'] > args.max_lateness:
+        failures.append(f"max lateness {results['lateness_max']:.3f}s > {args.max_lateness}s")
+    if args.min_throughput is not None and results['end_per_second'] < args.min_throughput:
+        failures.append(f"end throughput {results['end_per_second']:.0f}/s < {args.min_throughput}/s")
+    if args.max_memory is not None and results['peak_mib'] > args.max_memory:
+        failures.append(f"peak memory {results['peak_mib']:.1f} MiB > {args.max_memory} MiB")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return failures
+
+
+def bench_startup(args):
+    """Import the bot, then load a seeded database the way the first on_ready does
+
+    Returns the thresholds that were missed.
+    """
+    count = args.count or 10_000
+    script = (
+        "import time; started = time.perf_counter(); import discord; "
+        "discord_done = time.perf_counter(); import main; "
+        "print(discord_done - started, time.perf_counter() - started)"
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True,
+    ).stdout
+    import_discord, import_main = map(float, output.split())
+    main.bot.get_channel = lambda channel_id: None
+
+    async def run():
+        with tempfile.TemporaryDirectory() as directory:
+            main.store = main.GiveawayStore(os.path.join(directory, 'giveaways.db'))
+            main.GIVEAWAYS_FILE = os.path.join(directory, 'giveaways.json')
+
+            # Every giveaway still running, so the load isn't mixed up with the catch-up
+            now = time.time()
+            rows = [
+                (message_id, channel_id, now + 3600 + index, winners, prize, reaction, *rest)
+                for index, (message_id, channel_id, _, winners, prize, reaction, *rest) in enumerate(sample_rows(count))
+            ]
+
+            def seed(conn):
+                with conn:
+                    conn.executemany(main.GiveawayStore.WRITES['giveaway'][0], rows)
+                    conn.executemany(main.GiveawayStore.WRITES['entrant'][0], (
+                        (row[0], user_id) for row in rows for user_id in range(1, args.entrants + 1)
+                    ))
+
+            await main.store._run(lambda: seed(main.store._connection()))
+            started = time.perf_counter()
+            await main.store._run(main.store._load_chunk, 1, None, (float('-inf'), 0), count)
+            one_shot = time.perf_counter() - started
+
+            # The longest the event loop went without running a 1 ms ticker
+            stall = 0.0
+            loading = True
+
+            async def ticker():
+                nonlocal stall
+                last = time.perf_counter()
+                while loading:
+                    await asyncio.sleep(0.001)
+                    tick = time.perf_counter()
+                    stall = max(stall, tick - last)
+                    last = tick
+
+            ticking = asyncio.create_task(ticker())
+            await main.load_state()
+            loading = False
+            await ticking
+            await main.store.flush()
+            return one_shot, stall
+
+    one_shot, stall = asyncio.run(run())
+    report = main.startup_report
+    print(f"{count} giveaways x {args.entrants} entrants, {main.STATE_CHUNK_SIZE} per chunk")
+    print(f"  import discord {import_discord * 1000:10.1f} ms")
+    print(f"  import main    {import_main * 1000:10.1f} ms (including discord)")
+    print(f"  first chunk    {report['first_chunk'] * 1000:10.1f} ms until the first giveaways are scheduled")
+    print(f"  load           {report['duration'] * 1000:10.1f} ms for {report['giveaways']} giveaways in {report['chunks']} chunks")
+    print(f"  one-shot read  {one_shot * 1000:10.1f} ms for every giveaway and entrant in a single chunk")
+    print(f"  longest stall  {stall * 1000:10.1f} ms of the event loop while loading")
+
+    failures = []
+    if report['giveaways'] != count:
+        failures.append(f"{count - report['giveaways']} giveaways not loaded")
+    if args.max_stall is not None and stall > args.max_stall:
+        failures.append(f"event loop stall {stall:.3f}s > {args.max_stall}s")
+    if args.max_startup is not None and report['duration'] > args.max_startup:
+        failures.append(f"load took {report['duration']:.3f}s > {args.max_startup}s")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return failures
+
+
+BENCHMARKS = {
+    'durations': bench_durations,
+    'load': bench_load,
+    'messages': bench_messages,
+    'records': bench_records,
+    'startup': bench_startup,
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--count', type=int, help="number of giveaways (or of durations parsed, messages handled)")
+
+    load = parser.add_argument_group("load")
+    load.add_argument('--entrants', type=int, default=100, help="entrants per giveaway (also seeded by startup)")
+    load.add_argument('--channels', type=int, default=20, help="channels the giveaways are spread over")
+    load.add_argument('--delay', type=int, default=10, help="seconds from posting until a giveaway ends; leave room for posting them all")
+    load.add_argument('--window', type=int, default=5, help="seconds over which the giveaways end; 0 ends them all at once to measure peak end throughput")
+    load.add_argument('--timeout', type=float, default=60, help="seconds to wait past the window for stragglers")
+    load.add_argument('--latency', type=float, default=0.02, help="seconds each fake REST call takes")
+    load.add_argument('--rate-limit', type=float, default=0.0, help="fraction of REST calls answered with a 429")
+    load.add_argument('--retry-after', type=float, default=0.5, help="retry_after of injected 429s")
+    load.add_argument('--rerolls', type=int, default=100, help="archived giveaways to reroll")
+
+    thresholds = parser.add_argument_group("thresholds (load and startup, exit status 1 when missed)")
+    thresholds.add_argument('--max-lateness', type=float, help="seconds a giveaway may finish after its end time")
+    thresholds.add_argument('--min-throughput', type=float, help="giveaways ended per second")
+    thresholds.add_argument('--max-memory', type=float, help="peak traced memory in MiB")
+    thresholds.add_argument('--max-stall', type=float, help="seconds the event loop may block while state loads (startup)")
+    thresholds.add_argument('--max-startup', type=float, help="seconds the startup load may take (startup)")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    if args.count is None and args.benchmark not in ('load', 'startup'):
+        args.count = 100_000
+    sys.exit(1 if BENCHMARKS[args.benchmark](args) else 0)
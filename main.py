@@ -1,30 +1,163 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import asyncio
+import heapq
 import json
+import logging
+import math
+import bisect
 import random
+import re
+import secrets
+import shlex
+import sys
+import itertools
+import threading
+import contextlib
+import contextvars
+from array import array
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
 import datetime
+import enum
 import os
-import http.server
-import socketserver
-from threading import Thread
+import time
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
 from dotenv import load_dotenv
 
-# Create a simple HTTP server for Render.com health checks
-class SimpleHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-        self.wfile.write(b'Discord Giveaway Bot is running!')
+# Bucket upper bounds, in seconds, of the latency histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
 
-def run_web_server():
+class Histogram:
+    """Latency histogram that renders in the Prometheus text format"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def render(self, name, help_text):
+        return [f"# HELP {name} {help_text}", f"# TYPE {name} histogram", *self.samples(name)]
+
+    def samples(self, name, labels=''):
+        """Return the sample lines alone, e.g. for one labelled series of a family"""
+        prefix = f"{labels}," if labels else ''
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        labels = f"{{{labels}}}" if labels else ''
+        lines.append(f"{name}_sum{labels} {self.sum}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+def render_metrics():
+    """Collect the bot's metrics in the Prometheus text format"""
+    lines = []
+
+    def metric(kind, name, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{name}{suffix}{labels} {value}")
+
+    def summary(name, help_text, stats_by_label):
+        samples = []
+        for labels, stats in stats_by_label:
+            samples.append(('_sum', labels, stats.total))
+            samples.append(('_count', labels, stats.count))
+        metric('summary', name, help_text, samples)
+
+    now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+    metric('gauge', 'giveaways_active', "Giveaways waiting to end", [
+        ('', f'{{shard="{shard_id}"}}', len(shard_scheduler)) for shard_id, shard_scheduler in scheduler.shards.items()
+    ])
+    metric('gauge', 'giveaway_scheduler_lag_seconds', "How overdue the earliest scheduled giveaway is", [
+        ('', f'{{shard="{shard_id}"}}', shard_scheduler.lag(now)) for shard_id, shard_scheduler in scheduler.shards.items()
+    ])
+    metric('gauge', 'giveaway_schedules', "Recurring and delayed-start giveaways waiting for their next run", [('', '', len(giveaway_schedules))])
+    metric('gauge', 'giveaway_finalize_in_flight', "Giveaways currently being ended", [('', '', len(finalize_pool._in_flight))])
+    metric('counter', 'giveaway_finalize_failures_total', "end_giveaway calls that left the giveaway to be retried", [('', '', finalize_pool.failures)])
+    metric('gauge', 'giveaway_startup_load_seconds', "Time the startup load of giveaways from the database took", [('', '', startup_report['duration'])])
+    metric('gauge', 'giveaway_recovery_giveaways', "Overdue giveaways ended by the startup catch-up", [('', '', recovery_report['giveaways'])])
+    metric('gauge', 'giveaway_recovery_duration_seconds', "Time the startup catch-up took", [('', '', recovery_report['duration'])])
+    metric('gauge', 'giveaway_recovery_max_lateness_seconds', "Latest a giveaway ended during the startup catch-up", [('', '', recovery_report['max_lateness'])])
+    summary('giveaway_finalize_start_lateness_seconds', "Delay between a giveaway's end_time and the start of end_giveaway", [('', finalize_pool.start_lateness)])
+    summary('giveaway_finalize_lateness_seconds', "Delay between a giveaway's end_time and the end of end_giveaway", [('', finalize_pool.finish_lateness)])
+    lines.extend(finalize_pool.duration.render('giveaway_end_duration_seconds', "Time spent in end_giveaway"))
+    lines.append("# HELP giveaway_stage_seconds Time spent in each stage of a giveaway's lifecycle")
+    lines.append("# TYPE giveaway_stage_seconds histogram")
+    for stage, histogram in stage_latency.items():
+        lines.extend(histogram.samples('giveaway_stage_seconds', f'stage="{stage}"'))
+
+    lines.extend(store.write_latency.render('giveaway_store_write_seconds', "Time to commit one batch of giveaway changes"))
+    metric('gauge', 'giveaway_store_pending_writes', "Giveaway changes waiting to be written", [('', '', len(store._pending))])
+
+    metric('gauge', 'giveaway_outbound_queue_depth', "REST actions waiting in the outbound queue", [('', '', outbound.depth())])
+    summary('giveaway_outbound_wait_seconds', "Time REST actions spent waiting in the outbound queue", [
+        (f'{{route="{route}"}}', stats) for route, stats in outbound.wait_times.items()
+    ])
+    metric('counter', 'giveaway_outbound_coalesced_total', "Embed edits replaced by a newer edit", [('', '', outbound.coalesced)])
+    metric('counter', 'giveaway_outbound_rate_limited_total', "REST actions re-queued after a rate limit", [('', '', outbound.rate_limited)])
+
+    metric('counter', 'giveaway_role_cache_lookups_total', "Entrant role lookups by member cache result", [
+        ('', '{result="hit"}', role_cache.hits),
+        ('', '{result="miss"}', role_cache.misses),
+        ('', '{result="unresolved"}', role_cache.unresolved),
+    ])
+    if math.isfinite(bot.latency):
+        metric('gauge', 'discord_gateway_latency_seconds', "Gateway heartbeat latency", [('', '', bot.latency)])
+    return "\n".join(lines) + "\n"
+
+async def handle_root(request):
+    return web.Response(text="Discord Giveaway Bot is running!", content_type='text/html')
+
+async def handle_liveness(request):
+    # Answering at all means the event loop isn't stuck
+    return web.Response(text="ok")
+
+async def handle_readiness(request):
+    if state_loaded and connected_shards.issuperset(owned_shard_ids()) and not bot.is_closed():
+        return web.Response(text="ready")
+    return web.Response(status=503, text="not ready")
+
+async def handle_metrics(request):
+    return web.Response(text=render_metrics(), content_type='text/plain', charset='utf-8')
+
+async def handle_profile(request):
+    if profiler is None:
+        return web.Response(status=404, text="Sampling profiler is off, set PROFILE_SAMPLING=1 to enable it")
+    text = profiler.report(int(request.query.get('limit', 50)))
+    if 'reset' in request.query:
+        profiler.reset()
+    return web.Response(text=text, content_type='text/plain', charset='utf-8')
+
+# Serve health checks and metrics on the bot's own event loop
+async def start_web_server():
     port = int(os.environ.get('PORT', 8080))
-    handler = SimpleHTTPRequestHandler
-    
-    with socketserver.TCPServer(("", port), handler) as httpd:
-        print(f"Serving health check endpoint at port {port}")
-        httpd.serve_forever()
+    app = web.Application()
+    app.router.add_get('/', handle_root)
+    app.router.add_get('/healthz', handle_liveness)
+    app.router.add_get('/readyz', handle_readiness)
+    app.router.add_get('/metrics', handle_metrics)
+    app.router.add_get('/debug/profile', handle_profile)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, port=port).start()
+    log.info("Serving health check endpoint at port %s", port)
+    return runner
 
 # Load environment variables
 load_dotenv()
@@ -36,47 +169,1260 @@ intents.message_content = True
 intents.reactions = True
 
 prefix = os.getenv('COMMAND_PREFIX', '+')
-bot = commands.Bot(command_prefix=prefix, intents=intents)
 
-# For storing active giveaways
+# Longest rate-limit wait discord.py sits through before raising RateLimited
+# and letting the outbound queue reschedule the action (30 is its minimum)
+MAX_RATELIMIT_WAIT = 30.0
+
+# Optional sharding across processes: the total number of shards and the
+# shard ids this process runs. Without them every shard runs here.
+SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv('SHARD_IDS').split(',')] if os.getenv('SHARD_IDS') else None
+
+# Logging: LOG_FORMAT=json writes one JSON object per line for log shippers
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# Optional sampling profiler of the event loop, served at /debug/profile
+PROFILE_SAMPLING = os.getenv('PROFILE_SAMPLING', '').lower() in ('1', 'true', 'yes')
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.01))
+
+log = logging.getLogger('giveaways')
+
+# Giveaway the current task is working on, added to its log records
+current_giveaway = contextvars.ContextVar('current_giveaway', default=None)
+
+class GiveawayContextFilter(logging.Filter):
+    def filter(self, record):
+        if getattr(record, 'giveaway_id', None) is None:
+            record.giveaway_id = current_giveaway.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a JSON object, including its extra fields"""
+
+    # Attributes every LogRecord has, so anything else came in through extra=
+    STANDARD = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in self.STANDARD and value is not None)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def setup_logging():
+    handler = logging.StreamHandler()
+    handler.addFilter(GiveawayContextFilter())
+    formatter = JsonFormatter() if LOG_FORMAT == 'json' else discord.utils.MISSING
+    discord.utils.setup_logging(handler=handler, formatter=formatter, level=getattr(logging, LOG_LEVEL, logging.INFO))
+
+# Time spent in each stage of a giveaway's life: stage name -> Histogram
+stage_latency = {}
+
+@contextlib.contextmanager
+def span(stage, giveaway_id=None, **fields):
+    """Time one stage of a giveaway's lifecycle and log it with the giveaway's id
+
+    Yields a dict the stage can add fields to, e.g. how many entrants it saw.
+    """
+    token = current_giveaway.set(giveaway_id)
+    started = time.perf_counter()
+    failed = True
+    try:
+        yield fields
+        failed = False
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_latency.setdefault(stage, Histogram()).observe(elapsed)
+        log.debug("%s took %.1f ms", stage, elapsed * 1000, extra={
+            'giveaway_id': giveaway_id, 'span': stage, 'duration_ms': round(elapsed * 1000, 3), 'failed': failed, **fields,
+        })
+        current_giveaway.reset(token)
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack from a background thread
+
+    Counts how often each call stack is seen, so the report shows which
+    stage dominates when finalization runs late. Stacks are reported in the
+    collapsed format flame graph tools read.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.total = 0
+        self._samples = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def start(self):
+        """Start sampling the calling thread"""
+        if self._thread is not None:
+            return
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name='giveaway-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self.total = 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            with self._lock:
+                self._samples[';'.join(reversed(stack))] += 1
+                self.total += 1
+
+    def report(self, limit=50):
+        with self._lock:
+            common = self._samples.most_common(limit)
+            total = self.total
+        lines = [f"# {total} samples, one every {self.interval * 1000:g} ms"]
+        lines.extend(f"{stack} {count}" for stack, count in common)
+        return "\n".join(lines) + "\n"
+
+profiler = SamplingProfiler() if PROFILE_SAMPLING else None
+
+class GiveawayBot(commands.AutoShardedBot):
+    def __init__(self, **options):
+        super().__init__(
+            max_ratelimit_timeout=MAX_RATELIMIT_WAIT,
+            shard_count=SHARD_COUNT,
+            shard_ids=SHARD_IDS,
+            **options,
+        )
+
+    async def close(self):
+        # Write out giveaway changes that are still waiting to be flushed
+        await store.flush()
+        await super().close()
+
+bot = GiveawayBot(command_prefix=prefix, intents=intents)
+
+# For storing active giveaways: message id -> Giveaway
 active_giveaways = {}
 
-# Define the path for giveaways.json
+# Define the paths for the giveaway database and the legacy giveaways.json
+GIVEAWAYS_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'giveaways.db')
 GIVEAWAYS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'giveaways.json')
 
-# Load giveaways from file to persist across restarts
-def load_giveaways():
+# Seconds to gather giveaway changes before writing them as one batch
+STORE_FLUSH_INTERVAL = float(os.getenv('STORE_FLUSH_INTERVAL', 1.0))
+# Seconds between WAL checkpoints that fold the journal back into the database
+STORE_CHECKPOINT_INTERVAL = 300
+
+@dataclass(slots=True)
+class Giveaway:
+    """An active giveaway, keyed by the id of its message"""
+
+    message_id: int
+    channel_id: int
+    end_time: float
+    winners_count: int
+    prize: str
+    reaction: str
+    required_role: Optional[int] = None
+    forced_winner: Optional[int] = None
+    host_id: Optional[int] = None
+    # role_id -> extra entries for members holding that role
+    bonus_roles: dict = field(default_factory=dict)
+    guild_id: Optional[int] = None
+    # The embed the giveaway was posted with, as JSON, so ending or
+    # cancelling it needs no fetch of the message
+    embed: Optional[str] = None
+
+    def to_row(self):
+        """Return the giveaway as a row of GiveawayStore.COLUMNS"""
+        return (
+            self.message_id, self.channel_id, self.end_time, self.winners_count, self.prize,
+            self.reaction, self.required_role, self.forced_winner, self.host_id,
+            json.dumps(self.bonus_roles) if self.bonus_roles else None, self.guild_id, self.embed,
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        giveaway = cls(*row)
+        bonus_roles = json.loads(giveaway.bonus_roles) if giveaway.bonus_roles else {}
+        giveaway.bonus_roles = {int(role_id): entries for role_id, entries in bonus_roles.items()}
+        return giveaway
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a giveaway from the dicts giveaways.json used to hold"""
+        giveaway = cls(**{name: data[name] for name in cls.__dataclass_fields__ if name in data})
+        giveaway.bonus_roles = {int(role_id): entries for role_id, entries in (giveaway.bonus_roles or {}).items()}
+        return giveaway
+
+@dataclass(slots=True)
+class GiveawaySchedule:
+    """A giveaway to be started later, once or at a fixed interval
+
+    `config` is a template snapshot (see ConfigSession.to_template), so each
+    run is posted just in time instead of creating future messages upfront.
+    """
+
+    schedule_id: int
+    guild_id: int
+    host_id: Optional[int]
+    config: dict
+    next_run: float
+    # Seconds between runs, None for a one-off delayed start
+    interval: Optional[float] = None
+
+    def to_row(self):
+        return (self.schedule_id, self.guild_id, self.host_id, json.dumps(self.config), self.next_run, self.interval)
+
+    @classmethod
+    def from_row(cls, row):
+        schedule = cls(*row)
+        schedule.config = json.loads(schedule.config)
+        return schedule
+
+    def advance(self, now):
+        """Move next_run to the first run after now, skipping missed ones; False if it doesn't repeat"""
+        if not self.interval:
+            return False
+        missed = max(0, (now - self.next_run) // self.interval)
+        self.next_run += (missed + 1) * self.interval
+        return True
+
+class GiveawayStore:
+    """SQLite storage for active giveaways
+
+    Every query runs on one dedicated worker thread so disk I/O never blocks
+    the event loop. Changes are write-behind: save() and delete() only record
+    the latest state of a row, and a background task commits everything that
+    piled up as a single transaction. Several changes to the same giveaway
+    within one flush interval collapse into one write.
+
+    The database uses WAL mode with synchronous=FULL, so each batch is synced
+    to the journal when it commits. The journal is checkpointed into the main
+    file periodically, and SQLite replays it on the next open after a crash.
+    """
+
+    # In the same order as the fields of Giveaway
+    COLUMNS = (
+        'message_id', 'channel_id', 'end_time', 'winners_count', 'prize',
+        'reaction', 'required_role', 'forced_winner', 'host_id', 'bonus_roles',
+        'guild_id', 'embed',
+    )
+
+    ARCHIVE_COLUMNS = (
+        'message_id', 'channel_id', 'prize', 'winners_count', 'required_role',
+        'ended_at', 'entrants', 'cumulative', 'winners', 'draws',
+    )
+
+    # In the same order as the fields of GiveawaySchedule
+    SCHEDULE_COLUMNS = ('schedule_id', 'guild_id', 'host_id', 'config', 'next_run', 'interval')
+
+    # Schema changes, applied in order and tracked with PRAGMA user_version
+    MIGRATIONS = (
+        """
+        CREATE TABLE IF NOT EXISTS giveaways (
+            message_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            end_time REAL NOT NULL,
+            winners_count INTEGER NOT NULL,
+            prize TEXT NOT NULL,
+            reaction TEXT NOT NULL,
+            required_role INTEGER,
+            forced_winner INTEGER,
+            host_id INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS giveaways_end_time ON giveaways (end_time);
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS entrants (
+            message_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (message_id, user_id)
+        ) WITHOUT ROWID;
+        CREATE TRIGGER IF NOT EXISTS giveaways_delete_entrants AFTER DELETE ON giveaways
+        BEGIN
+            DELETE FROM entrants WHERE message_id = OLD.message_id;
+        END;
+        """,
+        """
+        ALTER TABLE giveaways ADD COLUMN bonus_roles TEXT;
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ended_giveaways (
+            message_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            prize TEXT NOT NULL,
+            winners_count INTEGER NOT NULL,
+            required_role INTEGER,
+            ended_at REAL NOT NULL,
+            entrants BLOB NOT NULL,
+            cumulative BLOB,
+            winners TEXT NOT NULL,
+            draws TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ended_giveaways_ended_at ON ended_giveaways (ended_at);
+        """,
+        """
+        ALTER TABLE giveaways ADD COLUMN guild_id INTEGER;
+        CREATE INDEX IF NOT EXISTS giveaways_guild_id ON giveaways (guild_id);
+        """,
+        """
+        ALTER TABLE giveaways ADD COLUMN embed TEXT;
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS templates (
+            guild_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            config TEXT NOT NULL,
+            PRIMARY KEY (guild_id, name)
+        ) WITHOUT ROWID;
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS schedules (
+            schedule_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            host_id INTEGER,
+            config TEXT NOT NULL,
+            next_run REAL NOT NULL,
+            interval REAL
+        );
+        """,
+    )
+
+    # Upsert and delete statements for each kind of queued change, in the
+    # order they are applied within a batch
+    WRITES = {
+        'entrant': (
+            'INSERT OR IGNORE INTO entrants (message_id, user_id) VALUES (?, ?)',
+            'DELETE FROM entrants WHERE message_id = ? AND user_id = ?',
+        ),
+        'giveaway': (
+            f"INSERT INTO giveaways ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)}) "
+            f"ON CONFLICT (message_id) DO UPDATE SET "
+            f"{', '.join(f'{column} = excluded.{column}' for column in COLUMNS[1:])}",
+            'DELETE FROM giveaways WHERE message_id = ?',
+        ),
+        'archive': (
+            f"INSERT OR REPLACE INTO ended_giveaways ({', '.join(ARCHIVE_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in ARCHIVE_COLUMNS)})",
+            'DELETE FROM ended_giveaways WHERE message_id = ?',
+        ),
+        'template': (
+            'INSERT OR REPLACE INTO templates (guild_id, name, config) VALUES (?, ?, ?)',
+            'DELETE FROM templates WHERE guild_id = ? AND name = ?',
+        ),
+        'schedule': (
+            f"INSERT OR REPLACE INTO schedules ({', '.join(SCHEDULE_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in SCHEDULE_COLUMNS)})",
+            'DELETE FROM schedules WHERE schedule_id = ?',
+        ),
+    }
+
+    def __init__(self, path, flush_interval=STORE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._conn = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='giveaway-store')
+        # (kind, key) -> parameters to upsert, or None to delete
+        self._pending = {}
+        self._dirty = asyncio.Event()
+        self._flusher = None
+        self._last_checkpoint = time.monotonic()
+        self.write_latency = Histogram()
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for index, migration in enumerate(self.MIGRATIONS[version:], start=version + 1):
+                conn.executescript(migration)
+                conn.execute(f'PRAGMA user_version={index}')
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _call(self, func, *args):
+        # Blocking variant for startup code that runs before the bot is live
+        return self._executor.submit(func, *args).result()
+
+    def _partition(self, shard_count, shard_ids):
+        # Giveaways belong to the shard of their guild; rows saved before the
+        # guild was recorded are returned to every partition to be claimed
+        if shard_ids is None:
+            return '1', ()
+        placeholders = ', '.join('?' for _ in shard_ids)
+        return f"(guild_id IS NULL OR (guild_id >> 22) % ? IN ({placeholders}))", (shard_count, *shard_ids)
+
+    def _load_chunk(self, shard_count, shard_ids, after, limit):
+        # Keyset pagination on (end_time, message_id), which the end_time
+        # index already orders by, so every chunk is an index range scan
+        conn = self._connection()
+        where, params = self._partition(shard_count, shard_ids)
+        query = (
+            f"SELECT {', '.join(self.COLUMNS)} FROM giveaways WHERE {where} AND (end_time, message_id) > (?, ?) "
+            f"ORDER BY end_time, message_id LIMIT ?"
+        )
+        giveaways = [Giveaway.from_row(row) for row in conn.execute(query, (*params, *after, limit))]
+        entrants = {}
+        if giveaways:
+            placeholders = ', '.join('?' for _ in giveaways)
+            query = f"SELECT message_id, user_id FROM entrants WHERE message_id IN ({placeholders})"
+            for message_id, user_id in conn.execute(query, [giveaway.message_id for giveaway in giveaways]):
+                entrants.setdefault(message_id, set()).add(user_id)
+        return giveaways, entrants
+
+    def _load_schedules(self, shard_count=1, shard_ids=None):
+        where, params = self._partition(shard_count, shard_ids)
+        query = f"SELECT {', '.join(self.SCHEDULE_COLUMNS)} FROM schedules WHERE {where} ORDER BY next_run"
+        return [GiveawaySchedule.from_row(row) for row in self._connection().execute(query, params)]
+
+    def _write_batch(self, batch):
+        conn = self._connection()
+        with conn:
+            for kind, (upsert_sql, delete_sql) in self.WRITES.items():
+                upserts = []
+                deletes = []
+                for (change_kind, key), params in batch.items():
+                    if change_kind != kind:
+                        continue
+                    if params is None:
+                        deletes.append(key if isinstance(key, tuple) else (key,))
+                    else:
+                        upserts.append(params)
+                conn.executemany(upsert_sql, upserts)
+                conn.executemany(delete_sql, deletes)
+
+    def _checkpoint(self):
+        self._connection().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def _archive_row(self, record):
+        cumulative = record['cumulative']
+        return (
+            record['message_id'], record['channel_id'], record['prize'], record['winners_count'],
+            record['required_role'], record['ended_at'], record['entrants'].tobytes(),
+            cumulative.tobytes() if cumulative is not None else None,
+            json.dumps(record['winners']), json.dumps(record['draws']),
+        )
+
+    def _archive_record(self, row):
+        record = dict(zip(self.ARCHIVE_COLUMNS, row))
+        record['entrants'] = array('Q', record['entrants'])
+        if record['cumulative'] is not None:
+            record['cumulative'] = array('Q', record['cumulative'])
+        record['winners'] = json.loads(record['winners'])
+        record['draws'] = json.loads(record['draws'])
+        return record
+
+    def _get_archive(self, message_id):
+        query = f"SELECT {', '.join(self.ARCHIVE_COLUMNS)} FROM ended_giveaways WHERE message_id = ?"
+        return self._connection().execute(query, (message_id,)).fetchone()
+
+    def _get_template(self, guild_id, name):
+        return self._connection().execute(
+            'SELECT guild_id, name, config FROM templates WHERE guild_id = ? AND name = ?', (guild_id, name)
+        ).fetchone()
+
+    def _list_templates(self, guild_id):
+        rows = self._connection().execute('SELECT name FROM templates WHERE guild_id = ? ORDER BY name', (guild_id,))
+        return [name for name, in rows]
+
+    def _prune_archive(self, cutoff):
+        conn = self._connection()
+        with conn:
+            return conn.execute('DELETE FROM ended_giveaways WHERE ended_at < ?', (cutoff,)).rowcount
+
+    def _is_empty(self):
+        return self._connection().execute('SELECT 1 FROM giveaways LIMIT 1').fetchone() is None
+
+    async def iter_giveaways(self, shard_count=1, shard_ids=None, chunk_size=500):
+        """Yield the given shards' giveaways in chunks ordered by end_time, with their entrants
+
+        Each chunk is a (giveaways, {giveaway id: entrant ids}) pair read on the
+        store's thread, so the event loop runs between chunks.
+        """
+        after = (float('-inf'), 0)
+        while True:
+            giveaways, entrants = await self._run(self._load_chunk, shard_count, shard_ids, after, chunk_size)
+            if giveaways:
+                yield giveaways, entrants
+            if len(giveaways) < chunk_size:
+                return
+            after = (giveaways[-1].end_time, giveaways[-1].message_id)
+
+    async def fetch_schedules(self, shard_count=1, shard_ids=None):
+        """Return the stored giveaway schedules of the given shards, ordered by next_run"""
+        return await self._run(self._load_schedules, shard_count, shard_ids)
+
+    def migrate_json(self, json_path):
+        """Import a legacy giveaways.json once, then rename it out of the way"""
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, 'r') as f:
+                legacy = json.load(f)
+        except json.JSONDecodeError:
+            log.warning("%s is not valid JSON, skipping migration", json_path)
+            return 0
+
+        if self._call(self._is_empty):
+            giveaways = [Giveaway.from_dict(giveaway) for giveaway in legacy.values()]
+            batch = {('giveaway', giveaway.message_id): giveaway.to_row() for giveaway in giveaways}
+            self._call(self._write_batch, batch)
+        else:
+            log.warning("%s already has giveaways, not importing %s", self.path, json_path)
+            legacy = {}
+        os.replace(json_path, json_path + '.migrated')
+        return len(legacy)
+
+    def _queue(self, kind, key, params):
+        self._pending[(kind, key)] = params
+        self._dirty.set()
+
+    def save(self, giveaway):
+        """Queue an insert or update of a single giveaway"""
+        self._queue('giveaway', giveaway.message_id, giveaway.to_row())
+
+    def delete(self, message_id):
+        """Queue the removal of a single giveaway and its entrants"""
+        self._queue('giveaway', message_id, None)
+
+    def add_entrant(self, message_id, user_id):
+        """Queue a user being entered into a giveaway"""
+        self._queue('entrant', (message_id, user_id), (message_id, user_id))
+
+    def remove_entrant(self, message_id, user_id):
+        """Queue a user being withdrawn from a giveaway"""
+        self._queue('entrant', (message_id, user_id), None)
+
+    def archive(self, record):
+        """Queue an insert or update of an ended giveaway's archive record"""
+        self._queue('archive', record['message_id'], self._archive_row(record))
+
+    async def get_archive(self, message_id):
+        """Return the archive record of an ended giveaway, or None"""
+        row = self._pending.get(('archive', message_id))
+        if row is None:
+            row = await self._run(self._get_archive, message_id)
+        return self._archive_record(row) if row is not None else None
+
+    def save_template(self, guild_id, name, config):
+        """Queue an insert or update of a guild's named giveaway template"""
+        self._queue('template', (guild_id, name), (guild_id, name, json.dumps(config)))
+
+    def delete_template(self, guild_id, name):
+        self._queue('template', (guild_id, name), None)
+
+    async def get_template(self, guild_id, name):
+        """Return a guild's template by name, or None"""
+        change = ('template', (guild_id, name))
+        if change in self._pending:
+            row = self._pending[change]
+        else:
+            row = await self._run(self._get_template, guild_id, name)
+        return json.loads(row[2]) if row is not None else None
+
+    async def list_templates(self, guild_id):
+        """Return the names of a guild's templates"""
+        await self.flush()
+        return await self._run(self._list_templates, guild_id)
+
+    def save_schedule(self, schedule):
+        """Queue an insert or update of a giveaway schedule"""
+        self._queue('schedule', schedule.schedule_id, schedule.to_row())
+
+    def delete_schedule(self, schedule_id):
+        self._queue('schedule', schedule_id, None)
+
+    def prune_archive(self, cutoff):
+        """Delete archive records of giveaways that ended before cutoff"""
+        return self._call(self._prune_archive, cutoff)
+
+    def start(self):
+        """Start the background task that writes queued changes"""
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def flush(self):
+        """Write every queued change in one transaction"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        started = time.perf_counter()
+        try:
+            await self._run(self._write_batch, batch)
+            self.write_latency.observe(time.perf_counter() - started)
+        except sqlite3.Error as e:
+            log.error("Error saving giveaways: %s", e)
+            # Put the batch back without clobbering anything queued since
+            for change, params in batch.items():
+                self._pending.setdefault(change, params)
+            self._dirty.set()
+
+    async def _flush_loop(self):
+        while True:
+            await self._dirty.wait()
+            # Let a burst of changes pile up so they share one commit
+            await asyncio.sleep(self.flush_interval)
+            self._dirty.clear()
+            await self.flush()
+
+            if time.monotonic() - self._last_checkpoint >= STORE_CHECKPOINT_INTERVAL:
+                self._last_checkpoint = time.monotonic()
+                try:
+                    await self._run(self._checkpoint)
+                except sqlite3.Error as e:
+                    log.error("Error checkpointing %s: %s", self.path, e)
+
+store = GiveawayStore(GIVEAWAYS_DB)
+
+# Decide whether a loaded giveaway belongs to this process
+def claim_giveaway(giveaway):
+    if giveaway.guild_id is None:
+        # Saved before giveaways recorded their guild: claim it if its
+        # channel is on one of this process's shards
+        channel = bot.get_channel(giveaway.channel_id)
+        if channel:
+            giveaway.guild_id = channel.guild.id
+            store.save(giveaway)
+        elif bot.shard_ids is not None:
+            return False
+    return True
+
+# Queue a giveaway to be saved to the database
+def save_giveaway(giveaway_data):
+    store.save(giveaway_data)
+
+# Days an ended giveaway can still be rerolled
+ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', 30))
+
+# Giveaways read from the database at a time during startup
+STATE_CHUNK_SIZE = int(os.getenv('STATE_CHUNK_SIZE', 500))
+
+class GiveawayIndex:
+    """Active giveaways per guild and channel, each channel sorted by end time
+
+    Backs list_giveaways, which only ever shows one guild, so listing a page
+    doesn't walk every active giveaway.
+    """
+
+    def __init__(self):
+        # guild_id -> {channel_id: sorted list of (end_time, message_id)}
+        self._guilds = {}
+
+    def add(self, giveaway):
+        channels = self._guilds.setdefault(giveaway.guild_id, {})
+        bisect.insort(channels.setdefault(giveaway.channel_id, []), (giveaway.end_time, giveaway.message_id))
+
+    def discard(self, giveaway):
+        channels = self._guilds.get(giveaway.guild_id, {})
+        entries = channels.get(giveaway.channel_id)
+        if not entries:
+            return
+        key = (giveaway.end_time, giveaway.message_id)
+        position = bisect.bisect_left(entries, key)
+        if position < len(entries) and entries[position] == key:
+            del entries[position]
+        if not entries:
+            del channels[giveaway.channel_id]
+            if not channels:
+                del self._guilds[giveaway.guild_id]
+
+    def _entries(self, guild_id, channel_id=None):
+        channels = self._guilds.get(guild_id, {})
+        if channel_id is not None:
+            return [channels.get(channel_id, [])]
+        return list(channels.values())
+
+    def count(self, guild_id, channel_id=None):
+        return sum(len(entries) for entries in self._entries(guild_id, channel_id))
+
+    def page(self, guild_id, start, size, channel_id=None):
+        """Return the message ids at positions start to start + size, soonest end first"""
+        merged = heapq.merge(*self._entries(guild_id, channel_id))
+        return [message_id for _, message_id in itertools.islice(merged, start, start + size)]
+
+giveaway_index = GiveawayIndex()
+
+# Remove a giveaway from memory, the scheduler and the database
+def remove_giveaway(giveaway_id):
+    giveaway_data = active_giveaways.pop(giveaway_id, None)
+    if giveaway_data is not None:
+        giveaway_index.discard(giveaway_data)
+    giveaway_entrants.pop(giveaway_id, None)
+    stale_entrants.discard(giveaway_id)
+    scheduler.unschedule(giveaway_id)
+    store.delete(giveaway_id)
+
+# Entrant user ids of each active giveaway, kept current from reaction events
+giveaway_entrants = {}
+
+# Giveaways that may have missed reaction events during downtime or a
+# gateway gap, and need one pass over their reactions to catch up
+stale_entrants = set()
+
+# Bumped for a shard on every new gateway session, so a reconciliation pass
+# that started before a gap doesn't mark its giveaway as up to date
+shard_generations = {}
+
+# Reaction events seen while a reconciliation pass is reading reactions
+reconcile_buffers = {}
+reconcile_tasks = {}
+background_tasks = set()
+
+# How many giveaways have their reactions re-read at the same time
+RECONCILE_CONCURRENCY = 2
+
+def add_entrant(giveaway_id, user_id):
+    buffer = reconcile_buffers.get(giveaway_id)
+    if buffer is not None:
+        buffer['added'].add(user_id)
+        buffer['removed'].discard(user_id)
+
+    entrants = giveaway_entrants.setdefault(giveaway_id, set())
+    if user_id not in entrants:
+        entrants.add(user_id)
+        store.add_entrant(giveaway_id, user_id)
+
+def discard_entrant(giveaway_id, user_id):
+    buffer = reconcile_buffers.get(giveaway_id)
+    if buffer is not None:
+        buffer['removed'].add(user_id)
+        buffer['added'].discard(user_id)
+
+    entrants = giveaway_entrants.get(giveaway_id)
+    if entrants and user_id in entrants:
+        entrants.remove(user_id)
+        store.remove_entrant(giveaway_id, user_id)
+
+@bot.event
+async def on_raw_reaction_add(payload):
+    giveaway_id = payload.message_id
+    giveaway_data = active_giveaways.get(giveaway_id)
+    if giveaway_data is None or str(payload.emoji) != giveaway_data.reaction:
+        return
+    if payload.user_id == bot.user.id or (payload.member and payload.member.bot):
+        return
+    add_entrant(giveaway_id, payload.user_id)
+
+@bot.event
+async def on_raw_reaction_remove(payload):
+    giveaway_id = payload.message_id
+    giveaway_data = active_giveaways.get(giveaway_id)
+    if giveaway_data is None or str(payload.emoji) != giveaway_data.reaction:
+        return
+    discard_entrant(giveaway_id, payload.user_id)
+
+def clear_entrants(giveaway_id):
+    for user_id in list(giveaway_entrants.get(giveaway_id, ())):
+        discard_entrant(giveaway_id, user_id)
+
+@bot.event
+async def on_raw_reaction_clear(payload):
+    if payload.message_id in active_giveaways:
+        clear_entrants(payload.message_id)
+
+@bot.event
+async def on_raw_reaction_clear_emoji(payload):
+    giveaway_data = active_giveaways.get(payload.message_id)
+    if giveaway_data is not None and str(payload.emoji) == giveaway_data.reaction:
+        clear_entrants(payload.message_id)
+
+@bot.event
+async def on_raw_message_delete(payload):
+    # Giveaways end from their cached embed, so a deleted message is only
+    # noticed here
+    if payload.message_id in active_giveaways:
+        log.info("Message %s was deleted, removing its giveaway", payload.message_id, extra={'giveaway_id': payload.message_id})
+        remove_giveaway(payload.message_id)
+
+@bot.event
+async def on_raw_bulk_message_delete(payload):
+    for message_id in payload.message_ids & active_giveaways.keys():
+        log.info("Message %s was deleted, removing its giveaway", message_id, extra={'giveaway_id': message_id})
+        remove_giveaway(message_id)
+
+async def reconcile_entrants(giveaway_id, message=None):
+    """Rebuild a giveaway's entrants from its reactions, keeping events seen meanwhile"""
+    giveaway_data = active_giveaways.get(giveaway_id)
+    if giveaway_data is None:
+        return
+
+    shard_id = shard_for_guild(giveaway_data.guild_id)
+    generation = shard_generations.get(shard_id)
+    buffer = reconcile_buffers[giveaway_id] = {'added': set(), 'removed': set()}
     try:
-        with open(GIVEAWAYS_FILE, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
-    except json.JSONDecodeError:
-        return {}
-
-# Save giveaways to file
-def save_giveaways():
+        fetched = set()
+        try:
+            if message is None:
+                channel = bot.get_channel(giveaway_data.channel_id)
+                if not channel:
+                    # end_giveaway takes care of giveaways whose channel is gone
+                    return
+                message = await channel.fetch_message(giveaway_id)
+
+            for reaction in message.reactions:
+                if str(reaction.emoji) == giveaway_data.reaction:
+                    async for user in reaction.users():
+                        if not user.bot:
+                            fetched.add(user.id)
+                    break
+        except discord.errors.NotFound:
+            # Deleted while the bot wasn't watching, so no delete event came
+            log.warning("Message %s not found", giveaway_id, extra={'giveaway_id': giveaway_id})
+            remove_giveaway(giveaway_id)
+            return
+        fetched |= buffer['added']
+        fetched -= buffer['removed']
+
+        if giveaway_id not in active_giveaways:
+            return
+        entrants = giveaway_entrants.get(giveaway_id, set())
+        for user_id in fetched - entrants:
+            store.add_entrant(giveaway_id, user_id)
+        for user_id in entrants - fetched:
+            store.remove_entrant(giveaway_id, user_id)
+        giveaway_entrants[giveaway_id] = fetched
+        if generation == shard_generations.get(shard_id):
+            stale_entrants.discard(giveaway_id)
+    finally:
+        del reconcile_buffers[giveaway_id]
+
+async def ensure_entrants(giveaway_id, message=None):
+    """Make sure a giveaway's entrants are complete before they are used"""
+    if giveaway_id not in stale_entrants:
+        return
+    task = reconcile_tasks.get(giveaway_id)
+    if task is None:
+        task = asyncio.create_task(reconcile_entrants(giveaway_id, message))
+        reconcile_tasks[giveaway_id] = task
+        task.add_done_callback(lambda _: reconcile_tasks.pop(giveaway_id, None))
+    await task
+
+async def reconcile_stale_entrants():
+    """Catch up every stale giveaway, soonest deadline first"""
+    stale = [giveaway_id for giveaway_id in stale_entrants if giveaway_id in active_giveaways]
+    stale.sort(key=lambda giveaway_id: active_giveaways[giveaway_id].end_time)
+    # A few workers share one iterator rather than a task per giveaway, so
+    # a restart with many giveaways doesn't stall the loop creating them
+    pending = iter(stale)
+
+    async def worker():
+        for giveaway_id in pending:
+            try:
+                await ensure_entrants(giveaway_id)
+            except discord.HTTPException as e:
+                log.warning("Error reconciling entrants of giveaway %s: %s", giveaway_id, e, extra={'giveaway_id': giveaway_id})
+
+    await asyncio.gather(*(worker() for _ in range(RECONCILE_CONCURRENCY)))
+
+# Entrant counts above which a whole guild is chunked instead of queried
+MEMBER_CHUNK_THRESHOLD = 1000
+# Most user ids a single member query can ask for
+MEMBER_QUERY_BATCH = 100
+
+class RoleEligibilityCache:
+    """Ids of the members holding each role, per guild
+
+    A role's set is built from the member cache the first time a giveaway
+    needs it and kept current from member events afterwards, so filtering
+    entrants by role is a set intersection. In a guild that isn't chunked
+    yet, entrants missing from the member cache are fetched in bulk instead
+    of being dropped; in a chunked one they have left.
+    """
+
+    def __init__(self):
+        # guild_id -> {role_id: set of member ids}
+        self._roles = {}
+        self.hits = 0
+        self.misses = 0
+        self.unresolved = 0
+
+    def _role_members(self, guild, role_id):
+        roles = self._roles.setdefault(guild.id, {})
+        members = roles.get(role_id)
+        if members is None:
+            role = guild.get_role(role_id)
+            members = {member.id for member in role.members} if role else set()
+            roles[role_id] = members
+        return members
+
+    def update_member(self, member):
+        """Bring the tracked role sets in line with a member's current roles"""
+        roles = self._roles.get(member.guild.id)
+        if not roles:
+            return
+        member_roles = {role.id for role in member.roles}
+        for role_id, members in roles.items():
+            if role_id in member_roles:
+                members.add(member.id)
+            else:
+                members.discard(member.id)
+
+    def remove_member(self, guild_id, user_id):
+        for members in self._roles.get(guild_id, {}).values():
+            members.discard(user_id)
+
+    def forget_role(self, guild_id, role_id):
+        self._roles.get(guild_id, {}).pop(role_id, None)
+
+    def forget_guild(self, guild_id):
+        self._roles.pop(guild_id, None)
+
+    async def _resolve(self, guild, user_ids):
+        if len(user_ids) > MEMBER_CHUNK_THRESHOLD:
+            await guild.chunk()
+            # The member cache is now complete, rebuild sets from it
+            self.forget_guild(guild.id)
+            return
+        for start in range(0, len(user_ids), MEMBER_QUERY_BATCH):
+            batch = user_ids[start:start + MEMBER_QUERY_BATCH]
+            for member in await guild.query_members(user_ids=batch, limit=len(batch)):
+                self.update_member(member)
+
+    async def resolve(self, guild, user_ids):
+        """Bring user_ids into the member cache, once per giveaway before holders() is used"""
+        missing = [user_id for user_id in user_ids if guild.get_member(user_id) is None]
+        self.misses += len(missing)
+        self.hits += len(user_ids) - len(missing)
+        if missing and not guild.chunked:
+            await self._resolve(guild, missing)
+        self.unresolved += sum(1 for user_id in missing if guild.get_member(user_id) is None)
+
+    def holders(self, guild, user_ids, role_id):
+        """Return the ids in user_ids of members holding role_id"""
+        return self._role_members(guild, role_id).intersection(user_ids)
+
+role_cache = RoleEligibilityCache()
+
+@bot.event
+async def on_member_update(before, after):
+    if before.roles != after.roles:
+        role_cache.update_member(after)
+
+@bot.event
+async def on_member_join(member):
+    role_cache.update_member(member)
+
+@bot.event
+async def on_raw_member_remove(payload):
+    role_cache.remove_member(payload.guild_id, payload.user.id)
+
+@bot.event
+async def on_guild_role_delete(role):
+    role_cache.forget_role(role.guild.id, role.id)
+
+@bot.event
+async def on_guild_remove(guild):
+    role_cache.forget_guild(guild.id)
+
+# Whether giveaways have been loaded from the database yet
+state_loaded = False
+
+# Shards whose gateway connection is currently up, for the readiness check
+connected_shards = set()
+
+def shard_for_guild(guild_id):
+    """Return the shard that receives a guild's events"""
+    if guild_id is None:
+        return 0
+    return (guild_id >> 22) % (bot.shard_count or 1)
+
+def owned_shard_ids():
+    """Return the shard ids run by this process"""
+    return bot.shard_ids if bot.shard_ids is not None else range(bot.shard_count or 1)
+
+def mark_entrants_stale(shard_id=None):
+    """Flag giveaways (of one shard, or all) for a reconciliation pass and start it"""
+    for giveaway_id, giveaway_data in active_giveaways.items():
+        if shard_id is None or shard_for_guild(giveaway_data.guild_id) == shard_id:
+            stale_entrants.add(giveaway_id)
+    task = asyncio.create_task(reconcile_stale_entrants())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+@bot.event
+async def on_shard_ready(shard_id):
+    connected_shards.add(shard_id)
+    shard_generations[shard_id] = shard_generations.get(shard_id, 0) + 1
+    # A shard becomes ready at startup and after every gateway session that
+    # could not be resumed; its reaction events may have been missed since
+    if state_loaded:
+        mark_entrants_stale(shard_id)
+
+@bot.event
+async def on_shard_resumed(shard_id):
+    connected_shards.add(shard_id)
+
+@bot.event
+async def on_shard_disconnect(shard_id):
+    connected_shards.discard(shard_id)
+
+# Progress of the startup load of giveaways from the database
+startup_report = {'giveaways': 0, 'chunks': 0, 'first_chunk': 0.0, 'duration': 0.0}
+
+def start_recovery(overdue):
+    task = asyncio.create_task(recover_overdue_giveaways(overdue))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def load_state():
+    """Load giveaways from the database in chunks, arming the scheduler as they arrive
+
+    Chunks come soonest end_time first, and the event loop keeps serving the
+    gateway and the health server between them. Overdue giveaways sort first,
+    so the catch-up (which then starts the scheduler) can begin as soon as
+    the first giveaway that is still running shows up.
+    """
+    global state_loaded
+    started = time.perf_counter()
+    store.start()
     try:
-        with open(GIVEAWAYS_FILE, 'w') as f:
-            json.dump(active_giveaways, f)
-    except PermissionError:
-        print(f"Warning: Permission denied when writing to {GIVEAWAYS_FILE}. Giveaway data won't persist.")
-    except Exception as e:
-        print(f"Error saving giveaways: {e}")
+        # Both block on the store's thread, so they can't run on it themselves
+        migrated = await asyncio.to_thread(store.migrate_json, GIVEAWAYS_FILE)
+        if migrated:
+            log.info("Migrated %d giveaways from %s to %s", migrated, GIVEAWAYS_FILE, GIVEAWAYS_DB)
+        cutoff = datetime.datetime.now(datetime.timezone.utc).timestamp() - ARCHIVE_RETENTION_DAYS * 86400
+        await asyncio.to_thread(store.prune_archive, cutoff)
+    except (sqlite3.Error, OSError) as e:
+        log.error("Error migrating giveaways: %s", e)
+
+    now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+    overdue = []
+    recovery = None
+    try:
+        async for giveaways, entrants in store.iter_giveaways(bot.shard_count or 1, bot.shard_ids, STATE_CHUNK_SIZE):
+            for giveaway in giveaways:
+                if not claim_giveaway(giveaway):
+                    continue
+                giveaway_id = giveaway.message_id
+                active_giveaways[giveaway_id] = giveaway
+                startup_report['giveaways'] += 1
+                giveaway_entrants[giveaway_id] = entrants.get(giveaway_id, set())
+                # Nothing was listening for reactions while the bot was down
+                stale_entrants.add(giveaway_id)
+                giveaway_index.add(giveaway)
+                if giveaway.end_time <= now:
+                    overdue.append((giveaway_id, giveaway.end_time))
+                else:
+                    if recovery is None:
+                        recovery = start_recovery(overdue)
+                    scheduler.schedule(giveaway_id, giveaway.end_time)
+            startup_report['chunks'] += 1
+            if startup_report['chunks'] == 1:
+                startup_report['first_chunk'] = time.perf_counter() - started
+    except sqlite3.Error as e:
+        log.error("Error loading giveaways: %s", e)
+    if recovery is None:
+        start_recovery(overdue)
+
+    # Runs missed while the bot was down are posted once, right away
+    try:
+        schedules = await store.fetch_schedules(bot.shard_count or 1, bot.shard_ids)
+    except sqlite3.Error as e:
+        log.error("Error loading giveaway schedules: %s", e)
+        schedules = []
+    for schedule in schedules:
+        giveaway_schedules[schedule.schedule_id] = schedule
+        start_scheduler.schedule(schedule.schedule_id, schedule.next_run)
+    start_scheduler.start()
+
+    state_loaded = True
+    # Picks up the stale giveaways of every shard, including any that
+    # became ready while the chunks were loading
+    mark_entrants_stale()
+    startup_report['duration'] = time.perf_counter() - started
+    log.info("Loaded %d giveaways in %d chunks in %.2fs", startup_report['giveaways'], startup_report['chunks'], startup_report['duration'])
+
+# The startup load, started by the first on_ready
+state_task = None
 
 @bot.event
 async def on_ready():
-    print(f'Bot is ready! Logged in as {bot.user}')
-    global active_giveaways
-    active_giveaways = load_giveaways()
-    check_giveaways.start()
-    
+    log.info("Bot is ready! Logged in as %s on shards %s of %s", bot.user, list(owned_shard_ids()), bot.shard_count)
+    global state_task
+    # on_ready can fire again after a reconnect; startup recovery only runs
+    # once, and in the background so the bot answers while it loads
+    if state_task is None:
+        state_task = asyncio.create_task(load_state())
+
     # Set bot status
     await bot.change_presence(activity=discord.Activity(
         type=discord.ActivityType.watching, 
         name="for giveaways"
     ))
 
+class ConfigOption(enum.Enum):
+    """The settings GiveawayView can change, valued by their select label"""
+
+    DURATION = "Modify duration"
+    CHANNEL = "Modify channel"
+    FORCED_WINNER = "Modify forced winner"
+    REMOVE_FORCED_WINNER = "Remove forced winner"
+    REQUIRED_ROLE = "Modify required role"
+    REMOVE_REQUIRED_ROLE = "Remove required role"
+    WINNERS = "Modify number of winners"
+    REACTION = "Modify reaction"
+    PRIZE = "Modify prize"
+    BONUS_ENTRIES = "Modify bonus entries"
+    REMOVE_BONUS_ENTRIES = "Remove bonus entries"
+
+def find_named(guild, text, get, items):
+    """Return what a mention, an id or a name refers to, or None"""
+    if guild is None:
+        raise ValueError("Giveaways can only be configured in a server.")
+    try:
+        return get(mention_id(text))
+    except ValueError:
+        name = text.lstrip('#@').lower()
+        return discord.utils.find(lambda item: item.name.lower() == name, items)
+
+# Each apply(session, guild, value) updates the session and returns the
+# confirmation, or raises ValueError with the message to show instead
+
+def set_duration(session, guild, value):
+    session.duration = parse_duration(value)
+    # An end time stays fixed however long it takes to press Validate
+    session.end_time = parse_end_time(value)
+    if session.end_time is not None:
+        return f"End time set to <t:{int(session.end_time)}:F>"
+    return f"Duration set to {format_duration(session.duration)}"
+
+def set_channel(session, guild, value):
+    channel = find_named(guild, value, guild and guild.get_channel, guild and guild.text_channels)
+    if not channel:
+        raise ValueError("Channel not found.")
+    session.channel = channel.id
+    return f"Channel set to {channel.mention}"
+
+def set_forced_winner(session, guild, value):
+    member = find_named(guild, value, guild and guild.get_member, guild and guild.members)
+    if not member:
+        raise ValueError("User not found.")
+    session.forced_winner = member.id
+    return f"Forced winner set to {member.mention}"
+
+def remove_forced_winner(session, guild, value):
+    session.forced_winner = None
+    return "Forced winner has been removed."
+
+def set_required_role(session, guild, value):
+    role = find_named(guild, value, guild and guild.get_role, guild and guild.roles)
+    if not role:
+        raise ValueError("Role not found.")
+    session.required_role = role.id
+    return f"Required role set to {role.mention}"
+
+def remove_required_role(session, guild, value):
+    session.required_role = None
+    return "Required role has been removed."
+
+def set_winners(session, guild, value):
+    try:
+        num_winners = int(value)
+    except ValueError:
+        raise ValueError("Please enter a valid number.")
+    if num_winners < 1:
+        raise ValueError("Number must be greater than 0.")
+    session.winners_count = num_winners
+    return f"Number of winners set to {num_winners}"
+
+def check_reaction(text):
+    """Raise ValueError unless text is an emoji the bot can react with"""
+    emoji = discord.PartialEmoji.from_str(text)
+    if emoji.id is not None:
+        # A custom emoji has to be one the bot can see
+        if bot.get_emoji(emoji.id) is None:
+            raise ValueError(f"{text} isn't an emoji I can use")
+    elif not text or len(text) > 16 or any(char.isspace() or (char.isascii() and char not in '#*0123456789') for char in text):
+        raise ValueError(f"{text} isn't an emoji")
+
+def set_reaction(session, guild, value):
+    check_reaction(value)
+    session.reaction = value
+    return f"Reaction set to {value}"
+
+def set_prize(session, guild, value):
+    session.prize = value
+    return f"Prize set to '{value}'"
+
+def set_bonus_entries(session, guild, value):
+    # A role mention, id or name followed by the number of extra entries
+    try:
+        role_text, extra_entries = value.rsplit(maxsplit=1)
+        extra_entries = int(extra_entries)
+    except ValueError:
+        raise ValueError("Invalid format. Please give a role followed by a number, e.g. @Boosters 2.")
+    role = find_named(guild, role_text, guild and guild.get_role, guild and guild.roles)
+    if not role:
+        raise ValueError("Role not found.")
+    if extra_entries > 0:
+        session.bonus_roles[role.id] = extra_entries
+        return f"{role.mention} now gets {extra_entries} extra entries"
+    session.bonus_roles.pop(role.id, None)
+    return f"Bonus entries removed for {role.mention}"
+
+def remove_bonus_entries(session, guild, value):
+    session.bonus_roles = {}
+    return "Bonus entries have been removed."
+
+@dataclass(frozen=True)
+class ConfigHandler:
+    # Label and hint of the modal's text input, None to apply at once
+    label: Optional[str]
+    placeholder: Optional[str]
+    apply: object
+
+CONFIG_HANDLERS = {
+    ConfigOption.DURATION: ConfigHandler("Duration", "1h30m, 2d, 1w or an end time like <t:1700000000>", set_duration),
+    ConfigOption.CHANNEL: ConfigHandler("Channel", "Channel mention, ID or name", set_channel),
+    ConfigOption.FORCED_WINNER: ConfigHandler("Forced winner", "User mention, ID or name", set_forced_winner),
+    ConfigOption.REMOVE_FORCED_WINNER: ConfigHandler(None, None, remove_forced_winner),
+    ConfigOption.REQUIRED_ROLE: ConfigHandler("Required role", "Role mention, ID or name", set_required_role),
+    ConfigOption.REMOVE_REQUIRED_ROLE: ConfigHandler(None, None, remove_required_role),
+    ConfigOption.WINNERS: ConfigHandler("Number of winners", "1", set_winners),
+    ConfigOption.REACTION: ConfigHandler("Reaction", "🎉", set_reaction),
+    ConfigOption.PRIZE: ConfigHandler("Prize", "Nitro Classic", set_prize),
+    ConfigOption.BONUS_ENTRIES: ConfigHandler("Bonus entries", "Role followed by its extra entries, e.g. Boosters 2", set_bonus_entries),
+    ConfigOption.REMOVE_BONUS_ENTRIES: ConfigHandler(None, None, remove_bonus_entries),
+}
+
+class ConfigModal(discord.ui.Modal):
+    """Asks for the value of one giveaway setting"""
+
+    def __init__(self, option):
+        super().__init__(title=option.value)
+        self.option = option
+        handler = CONFIG_HANDLERS[option]
+        self.value = discord.ui.TextInput(label=handler.label, placeholder=handler.placeholder, max_length=200)
+        self.add_item(self.value)
+
+    async def on_submit(self, interaction: discord.Interaction):
+        session = sessions.get_or_create((interaction.guild_id, interaction.user.id), interaction.channel_id)
+        try:
+            confirmation = CONFIG_HANDLERS[self.option].apply(session, interaction.guild, self.value.value.strip())
+        except ValueError as e:
+            confirmation = str(e)
+        await interaction.response.send_message(confirmation, ephemeral=True)
+
 class GiveawayView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
@@ -84,85 +1430,147 @@ class GiveawayView(discord.ui.View):
     @discord.ui.select(
         placeholder="Make a choice",
         options=[
-            discord.SelectOption(label="Modify duration", description="Set the giveaway duration", emoji="⏱️"),
-            discord.SelectOption(label="Modify channel", description="Choose the channel for the giveaway", emoji="🏷️"),
-            discord.SelectOption(label="Modify forced winner", description="Choose a forced winner", emoji="👑"),
-            discord.SelectOption(label="Remove forced winner", description="Remove the forced winner", emoji="👑"),
-            discord.SelectOption(label="Modify required role", description="Set required role to participate", emoji="☀️"),
-            discord.SelectOption(label="Remove required role", description="Remove the required role", emoji="🌞"),
-            discord.SelectOption(label="Modify number of winners", description="Choose the number of winners", emoji="👥"),
-            discord.SelectOption(label="Modify reaction", description="Choose the reaction for the giveaway", emoji="⭐"),
-            discord.SelectOption(label="Modify prize", description="Set the giveaway prize", emoji="🎁"),
+            discord.SelectOption(label=ConfigOption.DURATION.value, value=ConfigOption.DURATION.name, description="Set the giveaway duration", emoji="⏱️"),
+            discord.SelectOption(label=ConfigOption.CHANNEL.value, value=ConfigOption.CHANNEL.name, description="Choose the channel for the giveaway", emoji="🏷️"),
+            discord.SelectOption(label=ConfigOption.FORCED_WINNER.value, value=ConfigOption.FORCED_WINNER.name, description="Choose a forced winner", emoji="👑"),
+            discord.SelectOption(label=ConfigOption.REMOVE_FORCED_WINNER.value, value=ConfigOption.REMOVE_FORCED_WINNER.name, description="Remove the forced winner", emoji="👑"),
+            discord.SelectOption(label=ConfigOption.REQUIRED_ROLE.value, value=ConfigOption.REQUIRED_ROLE.name, description="Set required role to participate", emoji="☀️"),
+            discord.SelectOption(label=ConfigOption.REMOVE_REQUIRED_ROLE.value, value=ConfigOption.REMOVE_REQUIRED_ROLE.name, description="Remove the required role", emoji="🌞"),
+            discord.SelectOption(label=ConfigOption.WINNERS.value, value=ConfigOption.WINNERS.name, description="Choose the number of winners", emoji="👥"),
+            discord.SelectOption(label=ConfigOption.REACTION.value, value=ConfigOption.REACTION.name, description="Choose the reaction for the giveaway", emoji="⭐"),
+            discord.SelectOption(label=ConfigOption.PRIZE.value, value=ConfigOption.PRIZE.name, description="Set the giveaway prize", emoji="🎁"),
+            discord.SelectOption(label=ConfigOption.BONUS_ENTRIES.value, value=ConfigOption.BONUS_ENTRIES.name, description="Give a role extra entries", emoji="🍀"),
+            discord.SelectOption(label=ConfigOption.REMOVE_BONUS_ENTRIES.value, value=ConfigOption.REMOVE_BONUS_ENTRIES.name, description="Remove all bonus entries", emoji="🍂"),
         ]
     )
     async def select_option(self, interaction: discord.Interaction, select: discord.ui.Select):
-        option = select.values[0]
-        await interaction.response.send_message(f"Selected: {option}", ephemeral=True)
-        
-        # Store the current option in the user's state
-        user_id = str(interaction.user.id)
-        if user_id not in user_states:
-            user_states[user_id] = {}
-        user_states[user_id]['current_option'] = option
-        
-        if option == "Modify duration":
-            await interaction.followup.send("Please enter the duration in the format 1h, 2d, etc.", ephemeral=True)
-        elif option == "Modify channel":
-            await interaction.followup.send("Please mention the channel or provide the channel ID.", ephemeral=True)
-        elif option == "Modify forced winner":
-            await interaction.followup.send("Please mention the user or provide the user ID for the forced winner.", ephemeral=True)
-        elif option == "Remove forced winner":
-            user_states[user_id]['forced_winner'] = None
-            await interaction.followup.send("Forced winner has been removed.", ephemeral=True)
-        elif option == "Modify required role":
-            await interaction.followup.send("Please mention the role or provide the role ID.", ephemeral=True)
-        elif option == "Remove required role":
-            user_states[user_id]['required_role'] = None
-            await interaction.followup.send("Required role has been removed.", ephemeral=True)
-        elif option == "Modify number of winners":
-            await interaction.followup.send("Please enter the number of winners.", ephemeral=True)
-        elif option == "Modify reaction":
-            await interaction.followup.send("Please enter the emoji to use for the giveaway reaction.", ephemeral=True)
-        elif option == "Modify prize":
-            await interaction.followup.send("Please enter the prize for the giveaway.", ephemeral=True)
+        option = ConfigOption[select.values[0]]
+        handler = CONFIG_HANDLERS[option]
+        if handler.label is not None:
+            # The value is typed into a modal, so no chat message has to be read back
+            await interaction.response.send_modal(ConfigModal(option))
+            return
+        session = sessions.get_or_create((interaction.guild_id, interaction.user.id), interaction.channel_id)
+        await interaction.response.send_message(handler.apply(session, interaction.guild, None), ephemeral=True)
 
     @discord.ui.button(label="Validate", style=discord.ButtonStyle.green, custom_id="validate_button", emoji="✅")
     async def validate(self, interaction: discord.Interaction, button: discord.ui.Button):
-        user_id = str(interaction.user.id)
-        if user_id not in user_states or 'duration' not in user_states[user_id]:
+        session = sessions.get((interaction.guild_id, interaction.user.id))
+        if session is None or not session.duration:
             await interaction.response.send_message("Please set at least the duration before validating.", ephemeral=True)
             return
         
         # Create the giveaway
         try:
-            await create_giveaway(interaction, user_states[user_id])
-        except Exception as e:
-            await interaction.response.send_message(f"Error creating giveaway: {e}", ephemeral=True)
+            await create_giveaway(interaction, session)
+        except discord.HTTPException as e:
+            if interaction.response.is_done():
+                await interaction.followup.send(f"Error creating giveaway: {e}", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"Error creating giveaway: {e}", ephemeral=True)
 
     @discord.ui.button(label="Cancel", style=discord.ButtonStyle.red, custom_id="cancel_button", emoji="❌")
     async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
-        user_id = str(interaction.user.id)
-        if user_id in user_states:
-            del user_states[user_id]
+        sessions.discard((interaction.guild_id, interaction.user.id))
         await interaction.response.send_message("Giveaway creation cancelled.", ephemeral=True)
 
-# Dictionary to store user states during configuration
-user_states = {}
+# Most configuration sessions kept at once, and seconds an untouched one lives
+SESSION_LIMIT = 10000
+SESSION_TTL = 30 * 60
+
+class ConfigSession:
+    """A user's giveaway configuration while it is being set up"""
+
+    __slots__ = (
+        'duration', 'end_time', 'channel', 'forced_winner', 'required_role', 'winners_count',
+        'reaction', 'prize', 'bonus_roles', 'last_used',
+    )
+
+    def __init__(self, channel):
+        # In seconds
+        self.duration = 3600
+        # Timestamp the giveaway ends at when one was given instead of a duration
+        self.end_time = None
+        self.channel = channel
+        self.forced_winner = None
+        self.required_role = None
+        self.winners_count = 1
+        self.reaction = '🎉'
+        self.prize = 'Giveaway Prize'
+        self.bonus_roles = {}
+        self.last_used = time.monotonic()
+
+    # Settings kept when a configuration is saved as a template
+    TEMPLATE_FIELDS = (
+        'duration', 'channel', 'forced_winner', 'required_role', 'winners_count',
+        'reaction', 'prize', 'bonus_roles',
+    )
+
+    def to_template(self):
+        return {name: getattr(self, name) for name in self.TEMPLATE_FIELDS}
+
+    def apply_template(self, template):
+        for name in self.TEMPLATE_FIELDS:
+            if name in template:
+                setattr(self, name, template[name])
+        if 'duration' in template:
+            self.end_time = None
+        if isinstance(self.duration, str):
+            self.duration = parse_duration(self.duration)
+        # JSON object keys come back as strings
+        self.bonus_roles = {int(role_id): entries for role_id, entries in self.bonus_roles.items()}
+
+class SessionStore:
+    """Configuration sessions keyed by (guild_id, user_id)
+
+    Sessions are kept in least-recently-used order, so expiring idle ones and
+    enforcing the size cap only ever look at the oldest entries and every
+    lookup stays O(1).
+    """
+
+    def __init__(self, limit=SESSION_LIMIT, ttl=SESSION_TTL):
+        self.limit = limit
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _sweep(self, now):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used < self.ttl:
+                break
+            self._sessions.popitem(last=False)
+
+    def get(self, key):
+        """Return the live session for key, or None"""
+        now = time.monotonic()
+        self._sweep(now)
+        session = self._sessions.get(key)
+        if session is not None:
+            session.last_used = now
+            self._sessions.move_to_end(key)
+        return session
+
+    def get_or_create(self, key, channel):
+        session = self.get(key)
+        if session is None:
+            session = self._sessions[key] = ConfigSession(channel)
+            while len(self._sessions) > self.limit:
+                self._sessions.popitem(last=False)
+        return session
+
+    def discard(self, key):
+        self._sessions.pop(key, None)
+
+# Sessions of users configuring a giveaway
+sessions = SessionStore()
 
 @bot.command(name="giveaway")
 async def giveaway(ctx):
     """Start configuring a giveaway"""
-    user_id = str(ctx.author.id)
-    if user_id not in user_states:
-        user_states[user_id] = {
-            'duration': '1h',
-            'channel': ctx.channel.id,
-            'forced_winner': None,
-            'required_role': None,
-            'winners_count': 1,
-            'reaction': '🎉',
-            'prize': 'Giveaway Prize'
-        }
+    session = sessions.get_or_create((ctx.guild.id if ctx.guild else None, ctx.author.id), ctx.channel.id)
     
     view = GiveawayView()
     
@@ -171,338 +1579,877 @@ async def giveaway(ctx):
         description="Use the dropdown to configure your giveaway.",
         color=discord.Color(0xffffff)
     )
-    embed.add_field(name="Duration", value=user_states[user_id].get('duration', 'Not set'), inline=True)
-    embed.add_field(name="Channel", value=f"<#{user_states[user_id].get('channel', ctx.channel.id)}>", inline=True)
-    embed.add_field(name="Forced Winner", value=f"<@{user_states[user_id]['forced_winner']}>" if user_states[user_id].get('forced_winner') else "Not set", inline=True)
-    embed.add_field(name="Required Role", value=f"<@&{user_states[user_id]['required_role']}>" if user_states[user_id].get('required_role') else "Not set", inline=True)
-    embed.add_field(name="Winners Count", value=user_states[user_id].get('winners_count', 1), inline=True)
-    embed.add_field(name="Reaction", value=user_states[user_id].get('reaction', '🎉'), inline=True)
-    embed.add_field(name="Prize", value=user_states[user_id].get('prize', 'Giveaway Prize'), inline=True)
-    
-    await ctx.send(embed=embed, view=view)
-
-@bot.event
-async def on_message(message):
-    if message.author.bot:
-        return
-    
-    user_id = str(message.author.id)
-    if user_id in user_states and 'current_option' in user_states[user_id]:
-        option = user_states[user_id]['current_option']
-        
-        if option == "Modify duration":
-            # Validate duration format
-            content = message.content.lower()
-            if any(time_unit in content for time_unit in ['s', 'm', 'h', 'd']):
-                user_states[user_id]['duration'] = content
-                await message.channel.send(f"Duration set to {content}", delete_after=5)
-            else:
-                await message.channel.send("Invalid format. Please use format like 30s, 5m, 2h, 1d", delete_after=5)
-        
-        elif option == "Modify channel":
-            # Try to get channel from mention or ID
-            channel_id = message.content.strip()
-            if channel_id.startswith('<#') and channel_id.endswith('>'):
-                channel_id = channel_id[2:-1]
-            
-            try:
-                channel = message.guild.get_channel(int(channel_id))
-                if channel:
-                    user_states[user_id]['channel'] = channel.id
-                    await message.channel.send(f"Channel set to {channel.mention}", delete_after=5)
-                else:
-                    await message.channel.send("Channel not found.", delete_after=5)
-            except ValueError:
-                await message.channel.send("Invalid channel. Please mention a channel or provide a valid ID.", delete_after=5)
-        
-        elif option == "Modify forced winner":
-            # Try to get user from mention or ID
-            user_mention = message.content.strip()
-            if user_mention.startswith('<@') and user_mention.endswith('>'):
-                user_mention = user_mention[2:-1]
-                if user_mention.startswith('!'):
-                    user_mention = user_mention[1:]
-            
-            try:
-                member = message.guild.get_member(int(user_mention))
-                if member:
-                    user_states[user_id]['forced_winner'] = member.id
-                    await message.channel.send(f"Forced winner set to {member.mention}", delete_after=5)
-                else:
-                    await message.channel.send("User not found.", delete_after=5)
-            except ValueError:
-                await message.channel.send("Invalid user. Please mention a user or provide a valid ID.", delete_after=5)
-        
-        elif option == "Modify required role":
-            # Try to get role from mention or ID
-            role_mention = message.content.strip()
-            if role_mention.startswith('<@&') and role_mention.endswith('>'):
-                role_mention = role_mention[3:-1]
-            
-            try:
-                role = message.guild.get_role(int(role_mention))
-                if role:
-                    user_states[user_id]['required_role'] = role.id
-                    await message.channel.send(f"Required role set to {role.mention}", delete_after=5)
-                else:
-                    await message.channel.send("Role not found.", delete_after=5)
-            except ValueError:
-                await message.channel.send("Invalid role. Please mention a role or provide a valid ID.", delete_after=5)
-        
-        elif option == "Modify number of winners":
-            try:
-                num_winners = int(message.content.strip())
-                if num_winners > 0:
-                    user_states[user_id]['winners_count'] = num_winners
-                    await message.channel.send(f"Number of winners set to {num_winners}", delete_after=5)
-                else:
-                    await message.channel.send("Number must be greater than 0.", delete_after=5)
-            except ValueError:
-                await message.channel.send("Please enter a valid number.", delete_after=5)
-        
-        elif option == "Modify reaction":
-            emoji = message.content.strip()
-            # Basic emoji validation (simplistic)
-            user_states[user_id]['reaction'] = emoji
-            await message.channel.send(f"Reaction set to {emoji}", delete_after=5)
-        
-        elif option == "Modify prize":
-            prize = message.content.strip()
-            user_states[user_id]['prize'] = prize
-            await message.channel.send(f"Prize set to '{prize}'", delete_after=5)
-        
-        # Delete the user's message to keep the channel clean
-        try:
-            await message.delete()
-        except:
-            pass
-        
-        # Clear the current option after processing
-        del user_states[user_id]['current_option']
-        
-        # Don't process as a command
-        return
+    if session.end_time is not None:
+        embed.add_field(name="Ends At", value=f"<t:{int(session.end_time)}:F>", inline=True)
+    else:
+        embed.add_field(name="Duration", value=format_duration(session.duration) if session.duration else 'Not set', inline=True)
+    embed.add_field(name="Channel", value=f"<#{session.channel}>", inline=True)
+    embed.add_field(name="Forced Winner", value=f"<@{session.forced_winner}>" if session.forced_winner else "Not set", inline=True)
+    embed.add_field(name="Required Role", value=f"<@&{session.required_role}>" if session.required_role else "Not set", inline=True)
+    embed.add_field(name="Winners Count", value=session.winners_count, inline=True)
+    embed.add_field(name="Reaction", value=session.reaction, inline=True)
+    embed.add_field(name="Prize", value=session.prize, inline=True)
+    embed.add_field(name="Bonus Entries", value=", ".join(f"<@&{role_id}> +{entries}" for role_id, entries in session.bonus_roles.items()) if session.bonus_roles else "Not set", inline=True)
     
-    await bot.process_commands(message)
+    await ctx.send(embed=embed, view=view)
+
+# Seconds in each duration unit, and the longest a giveaway can run
+DURATION_UNITS = {'w': 7 * 86400, 'd': 86400, 'h': 3600, 'm': 60, 's': 1}
+MAX_DURATION = 365 * 86400
+# Longest duration or end time text looked at; anything longer is rejected
+# before it reaches the regexes
+MAX_DURATION_TEXT = 100
+
+# A compound duration such as 1h30m or 2 weeks 3 days, one number and unit per part
+DURATION_PART = re.compile(r'(\d+)\s*(w(?:eeks?)?|d(?:ays?)?|h(?:ours?|rs?)?|m(?:in(?:ute)?s?)?|s(?:ec(?:ond)?s?)?)\s*(?:,\s*)?', re.IGNORECASE)
+DURATION = re.compile(rf'(?:{DURATION_PART.pattern})+', re.IGNORECASE)
+# A Discord timestamp (<t:1700000000:R>) or an ISO 8601 date and time
+DISCORD_TIMESTAMP = re.compile(r'<t:(-?\d+)(?::[tTdDfFR])?>')
+ISO_TIMESTAMP = re.compile(r'\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?:Z|[+-]\d{2}:?\d{2})?', re.IGNORECASE)
+
+def parse_duration(text, now=None):
+    """Return the number of seconds in a duration
+
+    Accepts compound durations (1h30m, 2w 3d, 90 minutes) and absolute end
+    times as a Discord timestamp or an ISO 8601 date, taken as UTC unless it
+    has an offset. Raises ValueError for anything else.
+    """
+    text = text.strip()
+    if len(text) > MAX_DURATION_TEXT:
+        raise ValueError(f"Invalid duration, it can be at most {MAX_DURATION_TEXT} characters.")
+    if DURATION.fullmatch(text):
+        seconds = sum(int(amount) * DURATION_UNITS[unit[0].lower()] for amount, unit in DURATION_PART.findall(text))
+    else:
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+        end_time = parse_end_time(text)
+        if end_time is None:
+            raise ValueError(f"Invalid duration '{text}'. Please use a format like 30s, 1h30m, 2d or 1w, or an end time like <t:1700000000> or 2025-01-31T18:00")
+        seconds = math.ceil(end_time - now)
+        if seconds <= 0:
+            raise ValueError(f"{text} is in the past.")
+    if not 0 < seconds <= MAX_DURATION:
+        raise ValueError(f"Duration must be between 1 second and {MAX_DURATION // 86400} days.")
+    return seconds
+
+def parse_end_time(text):
+    """Return the timestamp of an absolute end time, or None if text is not one"""
+    text = text.strip()
+    if match := DISCORD_TIMESTAMP.fullmatch(text):
+        return int(match.group(1))
+    if ISO_TIMESTAMP.fullmatch(text):
+        end = datetime.datetime.fromisoformat(text.upper().replace('Z', '+00:00'))
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=datetime.timezone.utc)
+        return end.timestamp()
+    return None
+
+def format_duration(seconds):
+    """Return seconds as a compound duration such as 1d 2h 30m"""
+    parts = []
+    for unit, unit_seconds in DURATION_UNITS.items():
+        amount, seconds = divmod(seconds, unit_seconds)
+        if amount:
+            parts.append(f"{amount}{unit}")
+    return " ".join(parts) or "0s"
 
 async def create_giveaway(interaction, config):
-    """Create a giveaway with the provided configuration"""
-    duration_str = config['duration']
-    total_seconds = 0
-    
-    # Parse the duration string
-    if 'd' in duration_str:
-        days = int(duration_str.split('d')[0])
-        total_seconds += days * 86400
-    elif 'h' in duration_str:
-        hours = int(duration_str.split('h')[0])
-        total_seconds += hours * 3600
-    elif 'm' in duration_str:
-        minutes = int(duration_str.split('m')[0])
-        total_seconds += minutes * 60
-    elif 's' in duration_str:
-        seconds = int(duration_str.split('s')[0])
-        total_seconds += seconds
+    """Create a giveaway with the provided configuration
+
+    The interaction is deferred first: posting goes through the channel's
+    outbound queue, which can take longer than the 3 seconds Discord allows
+    before an interaction has to be answered.
+    """
+    await interaction.response.defer(ephemeral=True)
+    try:
+        giveaway_data = await start_giveaway(interaction.guild, config, interaction.user.id)
+    except ValueError as e:
+        await interaction.followup.send(str(e), ephemeral=True)
+        return
+    
+    # Confirm to the user
+    await interaction.followup.send(f"Giveaway created successfully in <#{giveaway_data.channel_id}>!", ephemeral=True)
+
+async def start_giveaway(guild, config, host_id):
+    """Post a giveaway in config.channel and start tracking it"""
+    total_seconds = config.duration
     
     # Use datetime with timezone info
-    end_time = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=total_seconds)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if config.end_time is not None:
+        end_time = datetime.datetime.fromtimestamp(config.end_time, datetime.timezone.utc)
+        if end_time <= now:
+            raise ValueError("The giveaway's end time has already passed.")
+    else:
+        end_time = now + datetime.timedelta(seconds=total_seconds)
     
     # Get the channel
-    channel = interaction.guild.get_channel(config['channel'])
+    channel = guild.get_channel(config.channel)
     if not channel:
-        await interaction.response.send_message("Invalid channel configuration.", ephemeral=True)
-        return
+        raise ValueError("Invalid channel configuration.")
     
     # Create giveaway embed
     embed = discord.Embed(
-        title=f"🎁 GIVEAWAY: {config['prize']}",
-        description=f"React with {config['reaction']} to enter!\n\n",
+        title=f"🎁 GIVEAWAY: {config.prize}",
+        description=f"React with {config.reaction} to enter!\n\n",
         color=discord.Color(0xffffff)
     )
     
     # Add fields
-    if config['required_role']:
-        role = interaction.guild.get_role(config['required_role'])
+    if config.required_role:
+        role = guild.get_role(config.required_role)
         if role:
             embed.description += f"Required Role: {role.mention}\n"
     
-    embed.add_field(name="Winners", value=config['winners_count'], inline=True)
+    for role_id, entries in config.bonus_roles.items():
+        role = guild.get_role(role_id)
+        if role:
+            embed.description += f"Bonus: {role.mention} gets {entries} extra entries\n"
+    
+    embed.add_field(name="Winners", value=config.winners_count, inline=True)
     embed.add_field(name="Ends At", value=f"<t:{int(end_time.timestamp())}:R>", inline=True)
     embed.set_footer(text=f"Giveaway ID: {len(active_giveaways) + 1}")
     
     # Send the giveaway message
-    giveaway_msg = await channel.send(embed=embed)
-    await giveaway_msg.add_reaction(config['reaction'])
+    with span('create', channel_id=channel.id):
+        giveaway_msg = await outbound.send(channel, embed=embed)
+        try:
+            await outbound.add_reaction(giveaway_msg, config.reaction)
+        except discord.HTTPException as e:
+            # Nobody could enter it, so don't leave the post behind
+            with contextlib.suppress(discord.HTTPException):
+                await outbound.delete(giveaway_msg)
+            raise ValueError(f"Couldn't react with {config.reaction}: {e.text or e.status}") from e
     
     # Store giveaway data
-    giveaway_data = {
-        'message_id': giveaway_msg.id,
-        'channel_id': channel.id,
-        'end_time': end_time.timestamp(),
-        'winners_count': config['winners_count'],
-        'prize': config['prize'],
-        'reaction': config['reaction'],
-        'required_role': config['required_role'],
-        'forced_winner': config['forced_winner'],
-        'host_id': interaction.user.id
-    }
-    
-    active_giveaways[str(giveaway_msg.id)] = giveaway_data
-    try:
-        save_giveaways()
-    except Exception as e:
-        print(f"Warning: Could not save giveaways: {e}")
+    giveaway_data = Giveaway(
+        message_id=giveaway_msg.id,
+        channel_id=channel.id,
+        end_time=end_time.timestamp(),
+        winners_count=config.winners_count,
+        prize=config.prize,
+        reaction=config.reaction,
+        required_role=config.required_role,
+        forced_winner=config.forced_winner,
+        host_id=host_id,
+        bonus_roles=dict(config.bonus_roles),
+        guild_id=channel.guild.id,
+        embed=json.dumps(embed.to_dict())
+    )
     
-    # Confirm to the user
-    await interaction.response.send_message(f"Giveaway created successfully in {channel.mention}!", ephemeral=True)
+    with span('schedule', giveaway_msg.id):
+        active_giveaways[giveaway_msg.id] = giveaway_data
+        giveaway_index.add(giveaway_data)
+        scheduler.schedule(giveaway_msg.id, giveaway_data.end_time)
+        save_giveaway(giveaway_data)
+    log.info("Giveaway %s created in channel %s, ending at %s", giveaway_msg.id, channel.id, end_time.isoformat(), extra={'giveaway_id': giveaway_msg.id})
+    return giveaway_data
 
-@tasks.loop(seconds=15)
-async def check_giveaways():
-    """Check for ended giveaways"""
-    current_time = datetime.datetime.now(datetime.timezone.utc).timestamp()
-    for giveaway_id, giveaway_data in list(active_giveaways.items()):
-        if current_time >= giveaway_data['end_time']:
-            await end_giveaway(giveaway_id, giveaway_data)
+# Delay before retrying a giveaway whose end_giveaway call failed
+END_RETRY_DELAY = 15
+
+class GiveawayScheduler:
+    """Min-heap of giveaway deadlines that sleeps until the next one is due
+
+    Cancelled or rescheduled entries are removed lazily: the heap keeps
+    (end_time, giveaway_id) pairs and `_deadlines` holds the live end time
+    for each giveaway, so stale pairs are skipped when they reach the top.
+    Each id is handed to on_due once its deadline passes.
+    """
+
+    def __init__(self, on_due):
+        self._on_due = on_due
+        self._heap = []
+        self._deadlines = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, giveaway_id, end_time):
+        """Add or move a giveaway deadline, waking the loop if it is the new earliest"""
+        self._deadlines[giveaway_id] = end_time
+        heapq.heappush(self._heap, (end_time, giveaway_id))
+        if self._heap[0] == (end_time, giveaway_id):
+            self._wakeup.set()
+        self._compact()
+
+    def unschedule(self, giveaway_id):
+        """Forget a giveaway deadline; its heap entry is dropped when it surfaces"""
+        end_time = self._deadlines.pop(giveaway_id, None)
+        if end_time is not None and self._heap and self._heap[0] == (end_time, giveaway_id):
+            self._wakeup.set()
+        self._compact()
+
+    def next_deadline(self):
+        """Return the earliest live deadline, or None if nothing is scheduled"""
+        while self._heap:
+            end_time, giveaway_id = self._heap[0]
+            if self._deadlines.get(giveaway_id) == end_time:
+                return end_time
+            heapq.heappop(self._heap)
+        return None
+
+    def lag(self, now):
+        """Seconds the earliest scheduled giveaway is overdue, 0 if none is"""
+        deadline = self.next_deadline()
+        return max(0, now - deadline) if deadline is not None else 0
+
+    def pop_due(self, now):
+        """Remove and return the ids of every giveaway whose deadline has passed"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            end_time, giveaway_id = heapq.heappop(self._heap)
+            if self._deadlines.get(giveaway_id) == end_time:
+                del self._deadlines[giveaway_id]
+                due.append(giveaway_id)
+        return due
+
+    def _compact(self):
+        # Rebuild once stale entries outnumber live ones so the heap stays O(n)
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._deadlines):
+            self._heap = [(end_time, giveaway_id) for giveaway_id, end_time in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+            for giveaway_id in self.pop_due(now):
+                self._on_due(giveaway_id)
+
+            deadline = self.next_deadline()
+            timeout = None
+            if deadline is not None:
+                timeout = max(0, deadline - datetime.datetime.now(datetime.timezone.utc).timestamp())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+class ShardedScheduler:
+    """One GiveawayScheduler per shard, each giveaway scheduled on its guild's shard
+
+    guild_of returns the guild id of a scheduled id; on_due is passed on to
+    the per-shard schedulers.
+    """
+
+    def __init__(self, guild_of, on_due):
+        self._guild_of = guild_of
+        self._on_due = on_due
+        self.shards = {}
+        self._owners = {}
+        self._started = False
+
+    def __len__(self):
+        return len(self._owners)
+
+    def _for_shard(self, shard_id):
+        shard_scheduler = self.shards.get(shard_id)
+        if shard_scheduler is None:
+            shard_scheduler = self.shards[shard_id] = GiveawayScheduler(self._on_due)
+            if self._started:
+                shard_scheduler.start()
+        return shard_scheduler
+
+    def schedule(self, giveaway_id, end_time):
+        shard_id = shard_for_guild(self._guild_of(giveaway_id))
+        previous = self._owners.get(giveaway_id)
+        if previous is not None and previous != shard_id:
+            self.shards[previous].unschedule(giveaway_id)
+        self._owners[giveaway_id] = shard_id
+        self._for_shard(shard_id).schedule(giveaway_id, end_time)
+
+    def unschedule(self, giveaway_id):
+        shard_id = self._owners.pop(giveaway_id, None)
+        if shard_id is not None:
+            self.shards[shard_id].unschedule(giveaway_id)
+
+    def lag(self, now):
+        return max((shard_scheduler.lag(now) for shard_scheduler in self.shards.values()), default=0)
+
+    def start(self):
+        self._started = True
+        for shard_scheduler in self.shards.values():
+            shard_scheduler.start()
+
+# Deadlines of active giveaways, ended by the finalize pool
+scheduler = ShardedScheduler(
+    lambda giveaway_id: active_giveaways[giveaway_id].guild_id,
+    lambda giveaway_id: finalize_pool.submit(giveaway_id),
+)
+
+# Maximum number of giveaways being ended at the same time
+MAX_CONCURRENT_ENDS = int(os.getenv('MAX_CONCURRENT_ENDS', 10))
+
+class LatencyStats:
+    """Running count, mean and max of a latency measured in seconds"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def as_dict(self):
+        mean = self.total / self.count if self.count else 0.0
+        return {'count': self.count, 'mean': mean, 'max': self.max, 'last': self.last}
+
+class FinalizePool:
+    """Ends due giveaways concurrently
+
+    A semaphore caps how many end_giveaway calls run at once, while a lock
+    per channel keeps giveaways in the same channel ending in deadline order.
+    Each giveaway runs in its own task so one failure doesn't hold up the rest.
+    """
+
+    def __init__(self, limit):
+        self._semaphore = asyncio.Semaphore(limit)
+        self._channel_locks = {}
+        self._channel_pending = {}
+        self._tasks = set()
+        # giveaway_id -> task ending it
+        self._in_flight = {}
+        self.failures = 0
+        # Seconds between end_time and the moment end_giveaway started / finished
+        self.start_lateness = LatencyStats()
+        self.finish_lateness = LatencyStats()
+        self.duration = Histogram()
+
+    def submit(self, giveaway_id):
+        """Queue a due giveaway to be ended and return the task ending it"""
+        if giveaway_id in self._in_flight:
+            return self._in_flight[giveaway_id]
+        task = asyncio.create_task(self._finalize(giveaway_id))
+        self._in_flight[giveaway_id] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _finalize(self, giveaway_id):
+        giveaway_data = active_giveaways.get(giveaway_id)
+        if giveaway_data is None:
+            self._in_flight.pop(giveaway_id, None)
+            return
+
+        channel_id = giveaway_data.channel_id
+        lock = self._channel_locks.setdefault(channel_id, asyncio.Lock())
+        self._channel_pending[channel_id] = self._channel_pending.get(channel_id, 0) + 1
+        try:
+            async with lock:
+                async with self._semaphore:
+                    if active_giveaways.get(giveaway_id) is not giveaway_data:
+                        # Cancelled or deleted while it waited its turn
+                        return
+                    now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+                    self.start_lateness.observe(max(0, now - giveaway_data.end_time))
+                    started = time.perf_counter()
+                    await end_giveaway(giveaway_id, giveaway_data)
+                    self.duration.observe(time.perf_counter() - started)
+                    now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+                    self.finish_lateness.observe(max(0, now - giveaway_data.end_time))
+        except Exception:
+            # Anything end_giveaway didn't expect; the giveaway is retried below
+            log.exception("Error ending giveaway %s", giveaway_id, extra={'giveaway_id': giveaway_id})
+        finally:
+            self._channel_pending[channel_id] -= 1
+            if not self._channel_pending[channel_id]:
+                del self._channel_pending[channel_id]
+                del self._channel_locks[channel_id]
+            self._in_flight.pop(giveaway_id, None)
+
+        # end_giveaway only removes the giveaway once it has been handled, so
+        # anything left behind failed and is retried later
+        if giveaway_id in active_giveaways:
+            self.failures += 1
+            retry_at = datetime.datetime.now(datetime.timezone.utc).timestamp() + END_RETRY_DELAY
+            scheduler.schedule(giveaway_id, retry_at)
+
+finalize_pool = FinalizePool(MAX_CONCURRENT_ENDS)
+
+# Outcome of the startup catch-up of giveaways that expired while the bot was down
+recovery_report = {'giveaways': 0, 'duration': 0.0, 'max_lateness': 0.0}
+
+async def recover_overdue_giveaways(overdue):
+    """End giveaways that expired during downtime, then hand over to the scheduler
+
+    overdue holds (giveaway id, end_time) pairs. They go to the finalize pool
+    most overdue first, so its concurrency limit bounds the batch; any that
+    were removed since they were loaded are skipped. The scheduler only
+    starts once the batch is done, and picks up anything that fell due in
+    the meantime.
+    """
+    started = time.perf_counter()
+    giveaway_ids = []
+    lateness = {}
+
+    async def recover(giveaway_id, task):
+        await task
+        # A giveaway still active failed to end and was rescheduled
+        if giveaway_id not in active_giveaways:
+            lateness[giveaway_id] = datetime.datetime.now(datetime.timezone.utc).timestamp() - end_times[giveaway_id]
 
-async def end_giveaway(giveaway_id, giveaway_data):
-    """End a giveaway and pick winners"""
     try:
-        channel = bot.get_channel(giveaway_data['channel_id'])
-        if not channel:
-            print(f"Channel {giveaway_data['channel_id']} not found")
-            del active_giveaways[giveaway_id]
-            save_giveaways()
+        end_times = {giveaway_id: end_time for giveaway_id, end_time in overdue if giveaway_id in active_giveaways}
+        giveaway_ids = sorted(end_times, key=end_times.get)
+        if giveaway_ids:
+            log.info("Catching up on %d giveaways that ended while the bot was offline", len(giveaway_ids))
+        await asyncio.gather(*(recover(giveaway_id, finalize_pool.submit(giveaway_id)) for giveaway_id in giveaway_ids))
+    finally:
+        scheduler.start()
+
+    duration = time.perf_counter() - started
+    recovery_report.update(
+        giveaways=len(lateness),
+        duration=duration,
+        max_lateness=max(lateness.values(), default=0.0),
+    )
+    for giveaway_id in giveaway_ids:
+        if giveaway_id in lateness:
+            log.info("Giveaway %s ended %.1fs late", giveaway_id, lateness[giveaway_id], extra={'giveaway_id': giveaway_id, 'lateness': lateness[giveaway_id]})
+    if giveaway_ids:
+        log.info("Caught up on %d of %d overdue giveaways in %.1fs", len(lateness), len(giveaway_ids), duration)
+
+# Priorities of outbound actions, lower runs first
+PRIORITY_ANNOUNCE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_COSMETIC = 2
+
+class OutboundAction:
+    __slots__ = ('route', 'priority', 'factory', 'future', 'queued_at', 'key')
+
+    def __init__(self, route, priority, factory, key):
+        self.route = route
+        self.priority = priority
+        self.factory = factory
+        self.future = asyncio.get_running_loop().create_future()
+        self.queued_at = time.monotonic()
+        self.key = key
+
+class OutboundQueue:
+    """Per-channel, per-route queues for the REST calls the bot makes in giveaway channels
+
+    Discord rate-limits sends, edits and reactions in a channel as separate
+    buckets, so each (channel, route) pair gets its own worker: a burst in one
+    bucket doesn't pile onto it, and doesn't hold up the other routes or
+    channels. Waiting actions run by priority, so winner announcements go
+    ahead of other sends. A new edit of a message replaces any earlier edit
+    of it that hasn't run.
+    """
+
+    def __init__(self):
+        # (channel_id, route) -> heap of (priority, sequence, action)
+        self._queues = {}
+        self._workers = {}
+        self._pending_edits = {}
+        self._sequence = itertools.count()
+        self.wait_times = {}
+        self.coalesced = 0
+        self.rate_limited = 0
+
+    def depth(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def submit(self, channel_id, route, priority, factory, key=None):
+        """Queue factory() to run in the worker of channel_id's route and return a future for its result"""
+        bucket = (channel_id, route)
+        if key is not None and key in self._pending_edits:
+            action = self._pending_edits[key]
+            action.factory = factory
+            self.coalesced += 1
+            if priority < action.priority:
+                # Re-queue at the higher priority; the old heap entry is skipped
+                action.priority = priority
+                self._push(bucket, action)
+            return action.future
+
+        action = OutboundAction(route, priority, factory, key)
+        # Failures are logged by the worker, so callers may ignore the future
+        action.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+        if key is not None:
+            self._pending_edits[key] = action
+        self._push(bucket, action)
+        if bucket not in self._workers:
+            self._workers[bucket] = asyncio.create_task(self._work(bucket))
+        return action.future
+
+    def send(self, channel, priority=PRIORITY_NORMAL, **kwargs):
+        return self.submit(channel.id, 'send', priority, lambda: channel.send(**kwargs))
+
+    def edit(self, message, priority=PRIORITY_COSMETIC, **kwargs):
+        return self.submit(message.channel.id, 'edit', priority, lambda: message.edit(**kwargs), key=('edit', message.id))
+
+    def add_reaction(self, message, emoji, priority=PRIORITY_NORMAL):
+        return self.submit(message.channel.id, 'react', priority, lambda: message.add_reaction(emoji))
+
+    def delete(self, message, priority=PRIORITY_NORMAL):
+        return self.submit(message.channel.id, 'delete', priority, lambda: message.delete())
+
+    @staticmethod
+    def _settle(action, future):
+        # Resolve a superseded action with the outcome of the one replacing it
+        if action.future.done():
             return
-        
+        if future.cancelled():
+            action.future.cancel()
+        elif future.exception() is not None:
+            action.future.set_exception(future.exception())
+        else:
+            action.future.set_result(future.result())
+
+    def _push(self, bucket, action):
+        heapq.heappush(self._queues.setdefault(bucket, []), (action.priority, next(self._sequence), action))
+
+    async def _work(self, bucket):
+        channel_id, _ = bucket
+        queue = self._queues[bucket]
         try:
-            message = await channel.fetch_message(int(giveaway_id))
-        except discord.errors.NotFound:
-            print(f"Message {giveaway_id} not found")
-            del active_giveaways[giveaway_id]
-            save_giveaways()
+            while queue:
+                priority, _, action = heapq.heappop(queue)
+                if priority != action.priority or action.future.done():
+                    # Superseded by a higher-priority entry, or given up on
+                    continue
+                if action.key is not None:
+                    self._pending_edits.pop(action.key, None)
+
+                self.wait_times.setdefault(action.route, LatencyStats()).observe(time.monotonic() - action.queued_at)
+                try:
+                    result = await action.factory()
+                except discord.RateLimited as e:
+                    # Put it back and let the bucket drain
+                    self.rate_limited += 1
+                    newer = action
+                    if action.key is not None:
+                        newer = self._pending_edits.setdefault(action.key, action)
+                    if newer is action:
+                        self._push(bucket, action)
+                    else:
+                        # A newer edit of the message was queued meanwhile;
+                        # replaying this one after it would undo it
+                        newer.future.add_done_callback(lambda future, action=action: self._settle(action, future))
+                    await asyncio.sleep(e.retry_after)
+                except Exception as e:
+                    log.warning("Error running %s in channel %s: %s", action.route, channel_id, e)
+                    action.future.set_exception(e)
+                else:
+                    action.future.set_result(result)
+        finally:
+            del self._queues[bucket]
+            del self._workers[bucket]
+
+outbound = OutboundQueue()
+
+class WeightedSampler:
+    """Fenwick tree over entry weights for O(log n) draws without replacement"""
+
+    def __init__(self, weights):
+        self._weights = array('Q', weights)
+        self._size = len(weights)
+        self._tree = array('Q', bytes(8 * (self._size + 1)))
+        for index, weight in enumerate(self._weights, start=1):
+            self._tree[index] += weight
+            parent = index + (index & -index)
+            if parent <= self._size:
+                self._tree[parent] += self._tree[index]
+        self.total = sum(self._weights)
+
+    def remove(self, position):
+        """Take the entry at position out of future draws"""
+        weight = self._weights[position]
+        if not weight:
             return
-        
-        # Get reaction users
-        reaction = None
-        for msg_reaction in message.reactions:
-            if str(msg_reaction.emoji) == giveaway_data['reaction']:
-                reaction = msg_reaction
-                break
-        
-        if not reaction:
-            await channel.send("Could not find the giveaway reaction. No winners selected.")
-            del active_giveaways[giveaway_id]
-            save_giveaways()
+        self._weights[position] = 0
+        self.total -= weight
+        index = position + 1
+        while index <= self._size:
+            self._tree[index] -= weight
+            index += index & -index
+
+    def draw(self, rng):
+        """Pick a position with probability proportional to its weight and remove it"""
+        target = rng.randrange(self.total)
+        position = 0
+        step = 1 << self._size.bit_length()
+        while step:
+            following = position + step
+            if following <= self._size and self._tree[following] <= target:
+                position = following
+                target -= self._tree[position]
+            step >>= 1
+        self.remove(position)
+        return position
+
+def reservoir_sample(ids, count, rng):
+    """Pick up to count ids uniformly from an iterable, holding only count of them
+
+    Uses Algorithm L, which skips ahead geometrically instead of drawing a
+    random number for every id.
+    """
+    iterator = iter(ids)
+    reservoir = list(itertools.islice(iterator, count))
+    if len(reservoir) < count or count == 0:
+        return reservoir
+    def unit():
+        # rng.random() can return exactly 0.0, which has no logarithm
+        return 1.0 - rng.random()
+
+    weight = math.exp(math.log(unit()) / count)
+    while True:
+        skip = math.floor(math.log(unit()) / math.log1p(-weight)) if weight < 1.0 else 0
+        chosen = next(itertools.islice(iterator, skip, None), None)
+        if chosen is None:
+            return reservoir
+        reservoir[rng.randrange(count)] = chosen
+        weight *= math.exp(math.log(unit()) / count)
+
+def new_draw_rng(seed=None):
+    """Return a seeded RNG and its seed, so every draw can be replayed from the log"""
+    if seed is None:
+        seed = secrets.randbits(64)
+    return random.Random(seed), seed
+
+def draw_winners(entrant_ids, count, rng, weights=None, exclude=()):
+    """Pick up to count distinct winners from a sorted array of entrant ids
+
+    With weights (one per entrant) winners are drawn proportionally to their
+    entries, otherwise uniformly. Ids in exclude can't be picked. The result
+    only depends on the inputs and the RNG state, so a draw is reproducible
+    from its seed and entrant snapshot.
+    """
+    exclude = set(exclude)
+    if weights is None:
+        return reservoir_sample((user_id for user_id in entrant_ids if user_id not in exclude), count, rng)
+
+    sampler = WeightedSampler(weights)
+    for user_id in exclude:
+        position = bisect.bisect_left(entrant_ids, user_id)
+        if position < len(entrant_ids) and entrant_ids[position] == user_id:
+            sampler.remove(position)
+    winners = []
+    while len(winners) < count and sampler.total:
+        winners.append(entrant_ids[sampler.draw(rng)])
+    return winners
+
+def redraw_winners(entrant_ids, count, rng, cumulative=None, exclude=()):
+    """Pick up to count new winners from an archived pool without rebuilding it
+
+    Positions are drawn directly and rejected if already excluded or picked,
+    which costs O(count) for a uniform pool and O(count log n) with the
+    cumulative entry counts of a weighted one. If the pool is mostly
+    excluded, the remaining picks fall back to draw_winners.
+    """
+    picked = []
+    seen = set(exclude)
+    # No more winners than entrants, so the rejection loop stays bounded
+    count = min(count, len(entrant_ids))
+    attempts = 4 * count + 16
+    while entrant_ids and len(picked) < count and attempts:
+        attempts -= 1
+        if cumulative is None:
+            position = rng.randrange(len(entrant_ids))
+        else:
+            position = bisect.bisect_right(cumulative, rng.randrange(cumulative[-1]))
+        user_id = entrant_ids[position]
+        if user_id not in seen:
+            seen.add(user_id)
+            picked.append(user_id)
+
+    if len(picked) < count:
+        weights = None
+        if cumulative is not None:
+            weights = array('Q', (high - low for low, high in zip(itertools.chain((0,), cumulative), cumulative)))
+        picked.extend(draw_winners(entrant_ids, count - len(picked), rng, weights, exclude=seen))
+    return picked
+
+def archive_giveaway(giveaway_data, entrant_ids, weights, winners, seed):
+    """Keep an ended giveaway's entrant snapshot and winners so it can be rerolled"""
+    store.archive({
+        'message_id': giveaway_data.message_id,
+        'channel_id': giveaway_data.channel_id,
+        'prize': giveaway_data.prize,
+        'winners_count': giveaway_data.winners_count,
+        'required_role': giveaway_data.required_role,
+        'ended_at': datetime.datetime.now(datetime.timezone.utc).timestamp(),
+        'entrants': entrant_ids,
+        'cumulative': array('Q', itertools.accumulate(weights)) if weights is not None else None,
+        'winners': list(winners),
+        'draws': [{'seed': seed, 'winners': list(winners)}],
+    })
+
+def entry_weights(guild, entrant_ids, bonus_roles):
+    """Return each entrant's number of entries: one plus the bonus of every role they hold"""
+    weights = array('Q', [1]) * len(entrant_ids)
+    for role_id, extra_entries in bonus_roles.items():
+        holders = role_cache.holders(guild, entrant_ids, role_id)
+        for position, user_id in enumerate(entrant_ids):
+            if user_id in holders:
+                weights[position] += extra_entries
+    return weights
+
+async def giveaway_message(channel, giveaway_id, giveaway_data):
+    """Return a giveaway's message and embed, fetching the message only if the embed isn't cached"""
+    if giveaway_data.embed is not None:
+        return channel.get_partial_message(giveaway_id), discord.Embed.from_dict(json.loads(giveaway_data.embed))
+    message = await channel.fetch_message(giveaway_id)
+    return message, message.embeds[0]
+
+async def end_giveaway(giveaway_id, giveaway_data):
+    """End a giveaway and pick winners
+
+    Each stage runs in a span, so its timing is logged and exported per stage.
+    Discord errors are logged here and leave the giveaway to be retried.
+    """
+    try:
+        channel = bot.get_channel(giveaway_data.channel_id)
+        if not channel:
+            log.warning("Channel %s not found", giveaway_data.channel_id, extra={'giveaway_id': giveaway_id})
+            remove_giveaway(giveaway_id)
             return
         
-        users = []
-        async for user in reaction.users():
-            if not user.bot:
-                # Check for required role if any
-                if giveaway_data['required_role']:
-                    member = channel.guild.get_member(user.id)
-                    if member and any(role.id == giveaway_data['required_role'] for role in member.roles):
-                        users.append(user)
-                else:
-                    users.append(user)
-        
-        winners = []
-        
-        # Add forced winner if any
-        if giveaway_data['forced_winner']:
-            forced_user = channel.guild.get_member(giveaway_data['forced_winner'])
-            if forced_user:
-                winners.append(forced_user)
-        
-        # Randomly select remaining winners
-        remaining_winners = giveaway_data['winners_count'] - len(winners)
-        if remaining_winners > 0 and users:
-            # Remove forced winners from the pool
-            eligible_users = [u for u in users if u.id not in [w.id for w in winners]]
-            winners.extend(random.sample(eligible_users, min(remaining_winners, len(eligible_users))))
-        
-        # Update embed to show that the giveaway has ended
-        embed = message.embeds[0]
-        embed.color=discord.Color(0xffffff)
-        embed.description = f"Giveaway ended!\n\n"
+        with span('fetch', giveaway_id) as fields:
+            try:
+                message, embed = await giveaway_message(channel, giveaway_id, giveaway_data)
+            except discord.errors.NotFound:
+                log.warning("Message %s not found", giveaway_id, extra={'giveaway_id': giveaway_id})
+                remove_giveaway(giveaway_id)
+                return
+            
+            # Entrants are tracked from reaction events as they happen; their
+            # reactions are only read back if events may have been missed
+            await ensure_entrants(giveaway_id, message if isinstance(message, discord.Message) else None)
+            if active_giveaways.get(giveaway_id) is not giveaway_data:
+                # Its message turned out to be gone while catching up
+                return
+            entrants = giveaway_entrants.get(giveaway_id, set())
+            fields['entrants'] = len(entrants)
         
-        if giveaway_data['required_role']:
-            role = channel.guild.get_role(giveaway_data['required_role'])
-            if role:
-                embed.description += f"Required Role: {role.mention}\n"
+        with span('filter', giveaway_id) as fields:
+            # Members are resolved once for the required and bonus roles
+            if giveaway_data.required_role or giveaway_data.bonus_roles:
+                await role_cache.resolve(channel.guild, entrants)
+            # Check for required role if any
+            if giveaway_data.required_role:
+                entrants = role_cache.holders(channel.guild, entrants, giveaway_data.required_role)
+            # Sorted so a draw can be replayed from its seed
+            users = array('Q', sorted(entrants))
+            fields['eligible'] = len(users)
         
-        if winners:
-            winners_text = ", ".join([winner.mention for winner in winners])
-            embed.description += f"Winners: {winners_text}"
+        with span('sample', giveaway_id) as fields:
+            winners = []
             
-            # Send congratulation message
-            congrats_message = f"🎉 Congratulations {winners_text}! You won **{giveaway_data['prize']}**!"
-            await channel.send(congrats_message)
-        else:
-            embed.description += "No valid participants. No winners selected."
-            await channel.send(f"No valid participants for the giveaway: **{giveaway_data['prize']}**")
+            # Add forced winner if any
+            if giveaway_data.forced_winner:
+                forced_user = channel.guild.get_member(giveaway_data.forced_winner)
+                if forced_user:
+                    winners.append(forced_user.id)
+            
+            weights = None
+            if giveaway_data.bonus_roles and users:
+                weights = entry_weights(channel.guild, users, giveaway_data.bonus_roles)
+            rng, seed = new_draw_rng()
+            
+            # Randomly select remaining winners
+            remaining_winners = giveaway_data.winners_count - len(winners)
+            if remaining_winners > 0 and users:
+                # Forced winners are excluded from the pool
+                winners.extend(draw_winners(users, remaining_winners, rng, weights, exclude=winners))
+            fields.update(winners=len(winners), seed=seed)
+        log.info("Giveaway %s: drew %d winners from %d entrants with seed %s", giveaway_id, len(winners), len(users), seed,
+                 extra={'giveaway_id': giveaway_id, 'seed': seed})
         
-        await message.edit(embed=embed)
+        with span('announce', giveaway_id):
+            # Update embed to show that the giveaway has ended
+            embed.color=discord.Color(0xffffff)
+            embed.description = f"Giveaway ended!\n\n"
+            
+            if giveaway_data.required_role:
+                role = channel.guild.get_role(giveaway_data.required_role)
+                if role:
+                    embed.description += f"Required Role: {role.mention}\n"
+            
+            if winners:
+                winners_text = ", ".join(f"<@{winner}>" for winner in winners)
+                embed.description += f"Winners: {winners_text}"
+                
+                # Send congratulation message
+                congrats_message = f"🎉 Congratulations {winners_text}! You won **{giveaway_data.prize}**!"
+                await outbound.send(channel, PRIORITY_ANNOUNCE, content=congrats_message)
+            else:
+                embed.description += "No valid participants. No winners selected."
+                await outbound.send(channel, PRIORITY_ANNOUNCE, content=f"No valid participants for the giveaway: **{giveaway_data.prize}**")
+            
+            # The winners already know, so the embed edit doesn't hold up the next giveaway
+            outbound.edit(message, embed=embed)
         
-        # Remove from active giveaways
-        del active_giveaways[giveaway_id]
-        save_giveaways()
+        with span('persist', giveaway_id):
+            # Archive the draw for rerolls, then remove from active giveaways
+            archive_giveaway(giveaway_data, users, weights, winners, seed)
+            remove_giveaway(giveaway_id)
     
-    except Exception as e:
-        print(f"Error ending giveaway {giveaway_id}: {e}")
+    except discord.HTTPException as e:
+        log.warning("Error ending giveaway %s: %s", giveaway_id, e, extra={'giveaway_id': giveaway_id})
 
 @bot.command(name="reroll")
 @commands.has_permissions(manage_messages=True)
-async def reroll(ctx, message_id: int = None):
+async def reroll(ctx, message_id: int = None, count: int = 1):
     """Reroll a giveaway to pick new winners"""
     if message_id is None:
-        await ctx.send("Please provide a message ID. Usage: `+reroll [message_id]`")
+        await ctx.send("Please provide a message ID. Usage: `+reroll [message_id] [count]`")
+        return
+    if count < 1:
+        await ctx.send("Number must be greater than 0.")
         return
-        
-    try:
-        # Check if the message exists in the current channel
-        try:
-            message = await ctx.channel.fetch_message(message_id)
-        except discord.errors.NotFound:
-            await ctx.send("Could not find that message in this channel.")
-            return
-        
-        # Check if it's a giveaway message (simple check)
-        if not message.embeds or "GIVEAWAY" not in message.embeds[0].title:
-            await ctx.send("That doesn't seem to be a giveaway message.")
-            return
-        
-        # Get reaction users
-        reaction = None
-        for msg_reaction in message.reactions:
-            reaction_emoji = str(msg_reaction.emoji)
-            # Try to find the giveaway reaction (default is 🎉 but could be customized)
-            if reaction_emoji in ["🎉", "🎊", "🎁", "🏆", "🥇"]:
-                reaction = msg_reaction
-                break
-        
-        if not reaction:
-            await ctx.send("Could not find a valid giveaway reaction.")
-            return
-        
-        users = []
-        async for user in reaction.users():
-            if not user.bot:
-                users.append(user)
-        
-        if not users:
-            await ctx.send("No participants found.")
-            return
-        
-        # Pick a random winner
-        winner = random.choice(users)
-        prize = message.embeds[0].title.split("GIVEAWAY:")[1].strip() if len(message.embeds[0].title.split("GIVEAWAY:")) > 1 else "the prize"
-        
-        # Send the result
-        await ctx.send(f"🎉 The new winner is {winner.mention}! Congratulations, you won **{prize}**!")
     
-    except Exception as e:
+    try:
+        record = await store.get_archive(message_id)
+    except sqlite3.Error as e:
         await ctx.send(f"An error occurred: {e}")
+        return
+    
+    # Only giveaways that ended in this server can be rerolled here
+    channel = bot.get_channel(record['channel_id']) if record else None
+    if not channel or channel.guild != ctx.guild:
+        await ctx.send("No ended giveaway found with that ID.")
+        return
+    if count > record['winners_count']:
+        await ctx.send(f"At most {record['winners_count']} winners can be rerolled at once for this giveaway.")
+        return
+    remaining = len(record['entrants']) - len(record['winners'])
+    if remaining < 1:
+        await ctx.send("No participants left to pick from.")
+        return
+    count = min(count, remaining)
+    
+    # Draw from the archived entrants, leaving out everyone who already won
+    with span('reroll', message_id):
+        rng, seed = new_draw_rng()
+        new_winners = redraw_winners(record['entrants'], count, rng, record['cumulative'], exclude=record['winners'])
+    if not new_winners:
+        await ctx.send("No participants left to pick from.")
+        return
+    
+    record['winners'].extend(new_winners)
+    record['draws'].append({'seed': seed, 'winners': new_winners})
+    store.archive(record)
+    log.info("Giveaway %s: rerolled %d winners from %d entrants with seed %s", message_id, len(new_winners), len(record['entrants']), seed, extra={'giveaway_id': message_id, 'seed': seed})
+    
+    # Send the result
+    winners_text = ", ".join(f"<@{winner}>" for winner in new_winners)
+    if len(new_winners) == 1:
+        await outbound.send(ctx.channel, PRIORITY_ANNOUNCE, content=f"🎉 The new winner is {winners_text}! Congratulations, you won **{record['prize']}**!")
+    else:
+        await outbound.send(ctx.channel, PRIORITY_ANNOUNCE, content=f"🎉 The new winners are {winners_text}! Congratulations, you won **{record['prize']}**!")
 
 @bot.command(name="cancel_giveaway")
 @commands.has_permissions(manage_messages=True)
@@ -512,72 +2459,453 @@ async def cancel_giveaway(ctx, message_id: int = None):
         await ctx.send("Please provide a message ID. Usage: `+cancel_giveaway [message_id]`")
         return
         
-    str_message_id = str(message_id)
-    if str_message_id in active_giveaways:
+    if message_id in active_giveaways:
         try:
             # Get the message
-            channel_id = active_giveaways[str_message_id]['channel_id']
+            channel_id = active_giveaways[message_id].channel_id
             channel = bot.get_channel(channel_id)
             if channel:
                 try:
-                    message = await channel.fetch_message(message_id)
-                    if message:
-                        # Update the embed
-                        embed = message.embeds[0]
-                        embed.color=discord.Color(0xffffff)
-                        embed.description = "This giveaway has been cancelled."
-                        await message.edit(embed=embed)
+                    message, embed = await giveaway_message(channel, message_id, active_giveaways[message_id])
+                    # Update the embed
+                    embed.color=discord.Color(0xffffff)
+                    embed.description = "This giveaway has been cancelled."
+                    outbound.edit(message, embed=embed)
                 except discord.errors.NotFound:
                     await ctx.send("Message not found, but giveaway will be removed from database.")
             
             # Remove from active giveaways
-            del active_giveaways[str_message_id]
-            save_giveaways()
+            remove_giveaway(message_id)
             await ctx.send("Giveaway cancelled successfully.")
-        except Exception as e:
+        except discord.HTTPException as e:
             await ctx.send(f"An error occurred: {e}")
     else:
         await ctx.send("No active giveaway found with that ID.")
 
+# Giveaways shown on each page of list_giveaways
+LIST_PAGE_SIZE = 10
+
+class GiveawayListView(discord.ui.View):
+    """Pages through a guild's active giveaways, building only the page on screen"""
+
+    def __init__(self, author, guild, channel=None):
+        super().__init__(timeout=180)
+        self.author = author
+        self.guild = guild
+        self.channel = channel
+        self.page = 0
+
+    def render(self):
+        channel_id = self.channel.id if self.channel else None
+        total = giveaway_index.count(self.guild.id, channel_id)
+        pages = max(1, math.ceil(total / LIST_PAGE_SIZE))
+        # Giveaways may have ended since the last page was shown
+        self.page = min(self.page, pages - 1)
+        
+        title = f"Active Giveaways in #{self.channel.name}" if self.channel else "Active Giveaways"
+        embed = discord.Embed(title=title, color=discord.Color(0xffffff))
+        for giveaway_id in giveaway_index.page(self.guild.id, self.page * LIST_PAGE_SIZE, LIST_PAGE_SIZE, channel_id):
+            giveaway_data = active_giveaways[giveaway_id]
+            channel = self.guild.get_channel(giveaway_data.channel_id)
+            channel_name = channel.name if channel else "Unknown channel"
+            embed.add_field(
+                name=f"Prize: {giveaway_data.prize}",
+                value=f"ID: {giveaway_id}\nChannel: #{channel_name}\nEnds: <t:{int(giveaway_data.end_time)}:R>",
+                inline=False
+            )
+        if not total:
+            embed.description = "No active giveaways."
+        embed.set_footer(text=f"Page {self.page + 1}/{pages} · {total} giveaways")
+        
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= pages - 1
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.author.id:
+            await interaction.response.send_message("Only the person who listed the giveaways can turn the pages.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.grey, emoji="⬅️")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.grey, emoji="➡️")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
 @bot.command(name="list_giveaways")
 @commands.has_permissions(manage_messages=True)
-async def list_giveaways(ctx):
-    """List all active giveaways"""
-    if not active_giveaways:
-        await ctx.send("No active giveaways.")
+async def list_giveaways(ctx, channel: discord.TextChannel = None):
+    """List the server's active giveaways, optionally only those in one channel"""
+    # A guild's giveaways all belong to its shard, which this process runs
+    if not giveaway_index.count(ctx.guild.id, channel.id if channel else None):
+        await ctx.send(f"No active giveaways in {channel.mention}." if channel else "No active giveaways.")
         return
     
-    embed = discord.Embed(
-        title="Active Giveaways",
-        color=discord.Color(0xffffff)
-    )
+    view = GiveawayListView(ctx.author, ctx.guild, channel)
+    await ctx.send(embed=view.render(), view=view)
+
+@bot.group(name="template", invoke_without_command=True)
+@commands.has_permissions(manage_messages=True)
+async def template(ctx):
+    """Manage saved giveaway configurations"""
+    await ctx.send("Usage: `+template save|load|delete <name>` or `+template list`")
+
+@template.command(name="save")
+@commands.has_permissions(manage_messages=True)
+async def template_save(ctx, name: str):
+    """Save your current +giveaway configuration as a template"""
+    session = sessions.get((ctx.guild.id, ctx.author.id))
+    if session is None:
+        await ctx.send("Configure a giveaway with `+giveaway` first.")
+        return
+    if session.end_time is not None:
+        await ctx.send("Templates keep a duration, not an end time. Set a duration such as `1d` first.")
+        return
+    store.save_template(ctx.guild.id, name.lower(), session.to_template())
+    await ctx.send(f"Template `{name.lower()}` saved.")
+
+@template.command(name="load")
+@commands.has_permissions(manage_messages=True)
+async def template_load(ctx, name: str):
+    """Load a template into your +giveaway configuration"""
+    saved = await store.get_template(ctx.guild.id, name.lower())
+    if saved is None:
+        await ctx.send(f"No template named `{name.lower()}`.")
+        return
+    session = sessions.get_or_create((ctx.guild.id, ctx.author.id), ctx.channel.id)
+    session.apply_template(saved)
+    await ctx.send(f"Template `{name.lower()}` loaded. Use `+giveaway` to review and validate it.")
+
+@template.command(name="delete")
+@commands.has_permissions(manage_messages=True)
+async def template_delete(ctx, name: str):
+    if await store.get_template(ctx.guild.id, name.lower()) is None:
+        await ctx.send(f"No template named `{name.lower()}`.")
+        return
+    store.delete_template(ctx.guild.id, name.lower())
+    await ctx.send(f"Template `{name.lower()}` deleted.")
+
+@template.command(name="list")
+@commands.has_permissions(manage_messages=True)
+async def template_list(ctx):
+    try:
+        names = await store.list_templates(ctx.guild.id)
+    except sqlite3.Error as e:
+        await ctx.send(f"An error occurred: {e}")
+        return
+    await ctx.send("Templates: " + ", ".join(f"`{name}`" for name in names) if names else "No templates saved.")
+
+# Recurring and delayed-start giveaways: schedule id -> GiveawaySchedule
+giveaway_schedules = {}
+schedule_runs = {}
+
+# Most schedules a server can have, and the shortest time between two runs
+SCHEDULE_LIMIT = 50
+MIN_SCHEDULE_INTERVAL = 60
+
+def remove_schedule(schedule_id):
+    giveaway_schedules.pop(schedule_id, None)
+    start_scheduler.unschedule(schedule_id)
+    store.delete_schedule(schedule_id)
+
+def submit_schedule_run(schedule_id):
+    """Post the next run of a schedule in the background"""
+    if schedule_id in schedule_runs:
+        return schedule_runs[schedule_id]
+    task = asyncio.create_task(run_schedule(schedule_id))
+    schedule_runs[schedule_id] = task
+    task.add_done_callback(lambda _: schedule_runs.pop(schedule_id, None))
+    return task
+
+async def run_schedule(schedule_id):
+    """Start one run of a schedule, then arm its next run or drop it"""
+    schedule = giveaway_schedules.get(schedule_id)
+    if schedule is None:
+        return
+    try:
+        guild = bot.get_guild(schedule.guild_id)
+        if guild is None:
+            raise ValueError(f"guild {schedule.guild_id} not found")
+        config = ConfigSession(schedule.config.get('channel'))
+        config.apply_template(schedule.config)
+        giveaway_data = await start_giveaway(guild, config, schedule.host_id)
+        log.info("Schedule %s: started giveaway %s", schedule_id, giveaway_data.message_id, extra={'giveaway_id': giveaway_data.message_id})
+    except ValueError as e:
+        # The configuration no longer works, e.g. its channel is gone, or
+        # the post went up but couldn't be reacted to and was taken down
+        log.warning("Schedule %s: skipped a run: %s", schedule_id, e)
+    except discord.HTTPException as e:
+        if e.status != 429 and e.status < 500:
+            # Forbidden, NotFound and the like won't go away on a retry
+            log.warning("Schedule %s: skipped a run: %s", schedule_id, e)
+        else:
+            log.warning("Error starting scheduled giveaway %s: %s", schedule_id, e)
+            if schedule_id in giveaway_schedules:
+                retry_at = datetime.datetime.now(datetime.timezone.utc).timestamp() + END_RETRY_DELAY
+                start_scheduler.schedule(schedule_id, retry_at)
+            return
     
-    for giveaway_id, giveaway_data in active_giveaways.items():
-        channel = bot.get_channel(giveaway_data['channel_id'])
-        channel_name = channel.name if channel else "Unknown channel"
-        
-        embed.add_field(
-            name=f"Prize: {giveaway_data['prize']}",
-            value=f"ID: {giveaway_id}\nChannel: #{channel_name}\nEnds: <t:{int(giveaway_data['end_time'])}:R>",
-            inline=False
+    if schedule_id not in giveaway_schedules:
+        # Cancelled while the run was being posted
+        return
+    if schedule.advance(datetime.datetime.now(datetime.timezone.utc).timestamp()):
+        store.save_schedule(schedule)
+        start_scheduler.schedule(schedule_id, schedule.next_run)
+    else:
+        remove_schedule(schedule_id)
+
+# Start times of scheduled giveaways, posted by run_schedule
+start_scheduler = ShardedScheduler(
+    lambda schedule_id: giveaway_schedules[schedule_id].guild_id,
+    submit_schedule_run,
+)
+
+REPEATS = {'daily': 86400, 'weekly': 7 * 86400}
+TIME_OF_DAY = re.compile(r'\d{1,2}:\d{2}')
+
+def parse_start(text, now):
+    """Return the timestamp of a start given as a delay (2h), a UTC time of day (18:00) or `now`"""
+    if text == 'now':
+        return now
+    if TIME_OF_DAY.fullmatch(text):
+        hour, _, minute = text.partition(':')
+        start = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).replace(hour=int(hour), minute=int(minute), second=0, microsecond=0)
+        if start.timestamp() <= now:
+            start += datetime.timedelta(days=1)
+        return start.timestamp()
+    return now + parse_duration(text, now)
+
+def parse_repeat(text):
+    """Return the seconds between runs for daily, weekly or an interval such as 6h"""
+    if text in REPEATS:
+        return REPEATS[text]
+    interval = parse_duration(text)
+    if interval < MIN_SCHEDULE_INTERVAL:
+        raise ValueError(f"Runs must be at least {MIN_SCHEDULE_INTERVAL} seconds apart.")
+    return interval
+
+@bot.group(name="schedule", invoke_without_command=True)
+@commands.has_permissions(manage_messages=True)
+async def schedule(ctx):
+    """Manage recurring and delayed-start giveaways"""
+    await ctx.send("Usage: `+schedule add <template> <start> [daily|weekly|interval]`, `+schedule list` or `+schedule cancel <id>`")
+
+@schedule.command(name="add")
+@commands.has_permissions(manage_messages=True)
+async def schedule_add(ctx, template_name: str, start: str, repeat: str = None):
+    """Start a template's giveaway later, optionally again at every interval
+
+    start is a delay such as 2h, a UTC time of day such as 18:00, or now.
+    """
+    if sum(schedule.guild_id == ctx.guild.id for schedule in giveaway_schedules.values()) >= SCHEDULE_LIMIT:
+        await ctx.send(f"This server already has {SCHEDULE_LIMIT} scheduled giveaways.")
+        return
+    now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+    try:
+        # Checked like a +bulk_giveaway entry, so a broken template fails now rather than at its first run
+        config = await bulk_config(ctx.guild, {'template': template_name}, ctx.channel.id)
+        next_run = parse_start(start.lower(), now)
+        interval = parse_repeat(repeat.lower()) if repeat else None
+    except ValueError as e:
+        await ctx.send(f"Couldn't schedule the giveaway: {e}")
+        return
+    
+    new_schedule = GiveawaySchedule(ctx.message.id, ctx.guild.id, ctx.author.id, config.to_template(), next_run, interval)
+    giveaway_schedules[new_schedule.schedule_id] = new_schedule
+    store.save_schedule(new_schedule)
+    start_scheduler.schedule(new_schedule.schedule_id, next_run)
+    
+    repeats = f", then every {repeat.lower()}" if repeat else ""
+    await ctx.send(f"Scheduled `{template_name.lower()}` (ID {new_schedule.schedule_id}) to start <t:{int(next_run)}:R>{repeats}.")
+
+@schedule.command(name="list")
+@commands.has_permissions(manage_messages=True)
+async def schedule_list(ctx):
+    schedules = sorted(
+        (schedule for schedule in giveaway_schedules.values() if schedule.guild_id == ctx.guild.id),
+        key=lambda schedule: schedule.next_run,
+    )
+    if not schedules:
+        await ctx.send("No scheduled giveaways.")
+        return
+    lines = []
+    for schedule in schedules:
+        repeats = f"every {int(schedule.interval)}s" if schedule.interval else "once"
+        lines.append(
+            f"ID {schedule.schedule_id}: **{schedule.config.get('prize')}** in <#{schedule.config.get('channel')}>, "
+            f"next <t:{int(schedule.next_run)}:R>, {repeats}"
         )
+    await ctx.send("\n".join(lines)[:2000])
+
+@schedule.command(name="cancel")
+@commands.has_permissions(manage_messages=True)
+async def schedule_cancel(ctx, schedule_id: int):
+    existing = giveaway_schedules.get(schedule_id)
+    if existing is None or existing.guild_id != ctx.guild.id:
+        await ctx.send("No scheduled giveaway found with that ID.")
+        return
+    remove_schedule(schedule_id)
+    await ctx.send("Scheduled giveaway cancelled. Giveaways it already started keep running.")
+
+# Most giveaways one +bulk_giveaway can create, how many are posted at
+# once, and the largest file it accepts
+BULK_LIMIT = 100
+BULK_CONCURRENCY = 5
+BULK_FILE_LIMIT = 256 * 1024
+
+def mention_id(text):
+    """Return the id in a channel, role or user mention, or a bare id"""
+    return int(text.strip().lstrip('<#@&!').rstrip('>'))
+
+async def bulk_config(guild, spec, default_channel):
+    """Build and check the configuration of one +bulk_giveaway entry
+
+    Raises ValueError describing the first problem found.
+    """
+    config = ConfigSession(default_channel)
+    unknown = set(spec) - {'template', 'prize', 'duration', 'channel', 'winners', 'reaction', 'role'}
+    if unknown:
+        raise ValueError(f"unknown field {', '.join(sorted(unknown))}")
+    if 'template' in spec:
+        saved = await store.get_template(guild.id, str(spec['template']).lower())
+        if saved is None:
+            raise ValueError(f"no template named {spec['template']}")
+        config.apply_template(saved)
+    
+    if 'prize' in spec:
+        config.prize = str(spec['prize']).strip()
+    if 'duration' in spec:
+        config.duration = parse_duration(str(spec['duration']))
+        config.end_time = parse_end_time(str(spec['duration']))
+    if 'reaction' in spec:
+        config.reaction = str(spec['reaction']).strip()
+    if 'winners' in spec:
+        config.winners_count = int(spec['winners'])
+    if 'channel' in spec:
+        config.channel = mention_id(str(spec['channel']))
+    if 'role' in spec:
+        config.required_role = mention_id(str(spec['role']))
     
-    await ctx.send(embed=embed)
+    if config.winners_count < 1:
+        raise ValueError("winners must be greater than 0")
+    if not config.prize or not config.reaction:
+        raise ValueError("prize and reaction can't be empty")
+    check_reaction(config.reaction)
+    channel = guild.get_channel(config.channel)
+    if not isinstance(channel, discord.TextChannel):
+        raise ValueError(f"channel {config.channel} not found")
+    permissions = channel.permissions_for(guild.me)
+    if not permissions.send_messages:
+        raise ValueError(f"can't send messages in {channel.mention}")
+    if not permissions.add_reactions:
+        raise ValueError(f"can't add reactions in {channel.mention}")
+    if config.required_role and not guild.get_role(config.required_role):
+        raise ValueError(f"role {config.required_role} not found")
+    return config
 
-# Run the bot
-if __name__ == "__main__":
-    # Start web server in a separate thread
-    print("Starting web server for health checks...")
-    server_thread = Thread(target=run_web_server)
-    server_thread.daemon = True  # This ensures the thread will close when the main program exits
-    server_thread.start()
+def parse_bulk_specs(text):
+    """Read +bulk_giveaway entries: a JSON list of objects, or one `key=value ...` line each"""
+    if text.lstrip().startswith('['):
+        specs = json.loads(text)
+        if not all(isinstance(spec, dict) for spec in specs):
+            raise ValueError("every entry of a JSON list must be an object")
+        return specs
+    specs = []
+    for line in text.splitlines():
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        spec = {}
+        for token in shlex.split(line):
+            key, separator, value = token.partition('=')
+            if not separator:
+                raise ValueError(f"expected key=value, got `{token}`")
+            spec[key.lower()] = value
+        specs.append(spec)
+    return specs
+
+@bot.command(name="bulk_giveaway")
+@commands.has_permissions(manage_messages=True)
+async def bulk_giveaway(ctx, *, entries: str = ""):
+    """Create many giveaways at once from a message or an attached file
+
+    Each line is one giveaway, e.g.
+    template=daily prize="Nitro Classic" duration=1d channel=#drops winners=2
+    A .json attachment may instead hold a list of objects with the same keys.
+    The whole batch is checked first, and nothing is created if any entry is invalid.
+    """
+    if ctx.message.attachments:
+        attachment = ctx.message.attachments[0]
+        if attachment.size > BULK_FILE_LIMIT:
+            await ctx.send(f"That file is too large, the limit is {BULK_FILE_LIMIT // 1024} KB.")
+            return
+        entries = (await attachment.read()).decode('utf-8', errors='replace')
+    
+    try:
+        specs = parse_bulk_specs(entries)
+    except ValueError as e:
+        await ctx.send(f"Couldn't read the giveaways: {e}")
+        return
+    if not specs:
+        await ctx.send("Usage: `+bulk_giveaway` followed by one `key=value ...` line per giveaway, or with a file attached.")
+        return
+    if len(specs) > BULK_LIMIT:
+        await ctx.send(f"At most {BULK_LIMIT} giveaways can be created at once.")
+        return
+    
+    # Validate the whole batch before posting anything
+    configs = []
+    errors = []
+    for number, spec in enumerate(specs, start=1):
+        try:
+            configs.append(await bulk_config(ctx.guild, spec, ctx.channel.id))
+        except (ValueError, TypeError) as e:
+            errors.append(f"Entry {number}: {e}")
+    if errors:
+        await ctx.send("Nothing was created:\n" + "\n".join(errors)[:1900])
+        return
+    
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+    
+    async def create_one(config):
+        async with semaphore:
+            return await start_giveaway(ctx.guild, config, ctx.author.id)
+    
+    results = await asyncio.gather(*(create_one(config) for config in configs), return_exceptions=True)
+    failures = [f"Entry {number}: {result}" for number, result in enumerate(results, start=1) if isinstance(result, Exception)]
+    summary = f"Created {len(results) - len(failures)} of {len(results)} giveaways."
+    if failures:
+        summary += "\n" + "\n".join(failures)
+    await ctx.send(summary[:2000])
+
+async def main():
+    # Health checks are answered while the bot is still logging in
+    log.info("Starting web server for health checks...")
+    runner = await start_web_server()
+    if profiler is not None:
+        # main() runs on the event loop's thread, the one to sample
+        profiler.start()
     
     # Run the Discord bot
-    print("Starting Discord Giveaway Bot...")
+    log.info("Starting Discord Giveaway Bot...")
+    try:
+        async with bot:
+            await bot.start(os.getenv('DISCORD_TOKEN'))
+    finally:
+        await runner.cleanup()
+
+# Run the bot
+if __name__ == "__main__":
+    setup_logging()
     try:
-        TOKEN = os.getenv('DISCORD_TOKEN')
-        bot.run(TOKEN)
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
     except discord.errors.LoginFailure:
-        print("Invalid token. Please check your token and try again.")
-    except Exception as e:
-        print(f"Error starting bot: {e}")
+        log.error("Invalid token. Please check your token and try again.")
+    except Exception:
+        log.exception("Error starting bot")
@@ -0,0 +1,98 @@
+"""Property checks for parse_duration and format_duration
+
+Inputs are generated from seeded RNGs, so a failure reproduces exactly.
+"""
+import datetime
+import random
+import time
+
+import pytest
+
+import main
+
+NOW = 1_700_000_000.0
+
+# Every spelling a unit can be written in
+SPELLINGS = {
+    'w': ('w', 'week', 'weeks', 'W', 'Weeks'),
+    'd': ('d', 'day', 'days', 'D'),
+    'h': ('h', 'hr', 'hrs', 'hour', 'hours', 'H'),
+    'm': ('m', 'min', 'mins', 'minute', 'minutes', 'M'),
+    's': ('s', 'sec', 'secs', 'second', 'seconds', 'S'),
+}
+
+
+def test_format_round_trips():
+    rng = random.Random(19)
+    samples = [1, 59, 60, 3600, 86400, 7 * 86400, main.MAX_DURATION]
+    samples += [rng.randint(1, main.MAX_DURATION) for _ in range(5000)]
+    for seconds in samples:
+        assert main.parse_duration(main.format_duration(seconds)) == seconds
+
+
+def test_compound_durations_sum_their_parts():
+    rng = random.Random(20)
+    for _ in range(5000):
+        units = rng.sample(list(SPELLINGS), rng.randint(1, len(SPELLINGS)))
+        parts = [(rng.randint(0, 50), unit) for unit in units]
+        expected = sum(amount * main.DURATION_UNITS[unit] for amount, unit in parts)
+        if not 0 < expected <= main.MAX_DURATION:
+            continue
+        text = ''
+        for amount, unit in parts:
+            if text:
+                text += rng.choice(('', ' ', ', ', ',', '  ,  '))
+            text += f"{amount}{rng.choice(('', ' '))}{rng.choice(SPELLINGS[unit])}"
+        assert main.parse_duration(text) == expected, text
+
+
+@pytest.mark.parametrize('text', ['5', '100', ' 42 ', '0', '1 2'])
+def test_bare_numbers_are_rejected(text):
+    with pytest.raises(ValueError):
+        main.parse_duration(text)
+
+
+def test_junk_is_rejected():
+    rng = random.Random(21)
+    alphabet = '0123456789xyzq!@#:-+,. '
+    for _ in range(5000):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+        with pytest.raises(ValueError):
+            main.parse_duration(text, NOW)
+    for text in ['h1', '1h30', '1hh', '1h x', 'm', '-1h', '1.5h', ',1h', '<t:abc>']:
+        with pytest.raises(ValueError):
+            main.parse_duration(text, NOW)
+
+
+@pytest.mark.parametrize('text', ['0s', '0h 0m', f"{main.MAX_DURATION + 1}s", '53w'])
+def test_out_of_range_durations_are_rejected(text):
+    with pytest.raises(ValueError):
+        main.parse_duration(text)
+
+
+def test_long_input_is_rejected_quickly():
+    started = time.perf_counter()
+    with pytest.raises(ValueError):
+        main.parse_duration('1h' + ' ' * 8000 + 'x')
+    assert main.DURATION.fullmatch('1h' + ' ' * 8000 + 'x') is None
+    assert time.perf_counter() - started < 0.5
+
+
+def test_end_times_are_relative_to_now():
+    rng = random.Random(22)
+    for _ in range(1000):
+        offset = rng.randint(1, main.MAX_DURATION)
+        end = NOW + offset
+        assert main.parse_duration(f"<t:{int(end)}:R>", NOW) == offset
+        iso = datetime.datetime.fromtimestamp(end, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+        assert main.parse_duration(iso, NOW) == offset
+        assert main.parse_end_time(iso) == end
+    # NOW is 22:13:20 UTC
+    assert main.parse_duration('2023-11-14T23:13:20+01:00', NOW - 60) == 60
+    assert main.parse_end_time('2h') is None
+
+
+@pytest.mark.parametrize('text', [f"<t:{int(NOW)}>", '2020-01-01', f"<t:{int(NOW) - 60}:F>"])
+def test_past_end_times_are_rejected(text):
+    with pytest.raises(ValueError):
+        main.parse_duration(text, NOW)
@@ -0,0 +1,103 @@
+"""Checks for the finalize pool that ends due giveaways"""
+import asyncio
+
+import main
+
+
+def giveaway(message_id, channel_id=1):
+    return main.Giveaway(
+        message_id=message_id, channel_id=channel_id, end_time=0.0, winners_count=1,
+        prize=f"P{message_id}", reaction='🎉', guild_id=1,
+    )
+
+
+def test_giveaway_cancelled_while_queued_is_not_ended(monkeypatch):
+    ended = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def end_giveaway(giveaway_id, giveaway_data):
+            ended.append(giveaway_id)
+            if giveaway_id == 1:
+                await release.wait()
+            main.remove_giveaway(giveaway_id)
+
+        monkeypatch.setattr(main, 'end_giveaway', end_giveaway)
+        monkeypatch.setattr(main, 'store', main.GiveawayStore(':memory:'))
+        pool = main.FinalizePool(10)
+        for message_id in (1, 2):
+            main.active_giveaways[message_id] = giveaway(message_id)
+        # Both share a channel, so 2 waits on the channel lock behind 1
+        first = pool.submit(1)
+        second = pool.submit(2)
+        await asyncio.sleep(0)
+        main.remove_giveaway(2)
+        release.set()
+        await asyncio.gather(first, second)
+        return pool
+
+    pool = asyncio.run(run())
+    assert ended == [1]
+    assert pool.failures == 0
+    assert not main.active_giveaways
+
+
+class MissingChannel:
+    """A channel whose giveaway message was deleted while the bot was down"""
+
+    id = 1
+    fetches = 0
+
+    def get_partial_message(self, message_id):
+        return object()
+
+    async def fetch_message(self, message_id):
+        MissingChannel.fetches += 1
+        raise main.discord.NotFound(FakeResponse(404), 'Unknown Message')
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+        self.reason = 'Not Found'
+
+
+def test_stale_giveaway_with_deleted_message_is_removed(monkeypatch):
+    async def run():
+        monkeypatch.setattr(main, 'store', main.GiveawayStore(':memory:'))
+        monkeypatch.setattr(main.bot, 'get_channel', lambda channel_id: MissingChannel())
+        pool = main.FinalizePool(10)
+        giveaway_data = giveaway(3)
+        giveaway_data.embed = '{"title": "P3"}'
+        main.active_giveaways[3] = giveaway_data
+        main.stale_entrants.add(3)
+        await pool.submit(3)
+        return pool
+
+    pool = asyncio.run(run())
+    assert 3 not in main.active_giveaways
+    assert 3 not in main.stale_entrants
+    assert pool.failures == 0
+    assert MissingChannel.fetches == 1
+
+
+def test_recovery_only_reports_giveaways_that_ended(monkeypatch):
+    async def run():
+        async def end_giveaway(giveaway_id, giveaway_data):
+            # 5 ends, 6 fails and stays active to be retried
+            if giveaway_id == 5:
+                main.remove_giveaway(giveaway_id)
+
+        monkeypatch.setattr(main, 'end_giveaway', end_giveaway)
+        monkeypatch.setattr(main, 'store', main.GiveawayStore(':memory:'))
+        monkeypatch.setattr(main, 'finalize_pool', main.FinalizePool(10))
+        monkeypatch.setattr(main.scheduler, 'start', lambda: None)
+        for message_id in (5, 6):
+            main.active_giveaways[message_id] = giveaway(message_id, channel_id=message_id)
+        await main.recover_overdue_giveaways([(5, 0.0), (6, 0.0)])
+        main.remove_giveaway(6)
+
+    asyncio.run(run())
+    assert main.recovery_report['giveaways'] == 1
+    assert main.recovery_report['max_lateness'] > 0
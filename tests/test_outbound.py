@@ -0,0 +1,53 @@
+"""Checks for the outbound REST queue"""
+import asyncio
+
+import discord
+
+import main
+
+
+def test_routes_of_a_channel_do_not_wait_on_each_other():
+    async def run():
+        queue = main.OutboundQueue()
+        release = asyncio.Event()
+
+        async def slow_send():
+            await release.wait()
+            return 'sent'
+
+        async def edit():
+            return 'edited'
+
+        sent = queue.submit(1, 'send', main.PRIORITY_NORMAL, slow_send)
+        edited = queue.submit(1, 'edit', main.PRIORITY_COSMETIC, edit, key=('edit', 5))
+        assert await asyncio.wait_for(edited, 1) == 'edited'
+        assert not sent.done()
+        release.set()
+        assert await sent == 'sent'
+
+    asyncio.run(run())
+
+
+def test_rate_limited_edit_does_not_overwrite_a_newer_one():
+    async def run():
+        queue = main.OutboundQueue()
+        applied = []
+        newer = []
+
+        async def old_edit():
+            if not newer:
+                # A newer edit of the message comes in while this one runs
+                newer.append(queue.submit(1, 'edit', main.PRIORITY_COSMETIC, new_edit, key=('edit', 5)))
+                raise discord.RateLimited(0.01)
+            applied.append('old')
+
+        async def new_edit():
+            applied.append('new')
+            return 'new'
+
+        old = queue.submit(1, 'edit', main.PRIORITY_COSMETIC, old_edit, key=('edit', 5))
+        assert await old == 'new'
+        assert await newer[0] == 'new'
+        assert applied == ['new']
+
+    asyncio.run(run())
@@ -0,0 +1,57 @@
+"""Checks for the role membership cache used to filter entrants"""
+import asyncio
+from types import SimpleNamespace
+
+import main
+
+
+class FakeGuild:
+    def __init__(self, members, roles, chunked):
+        # user id -> role ids
+        self.members = members
+        self.roles = roles
+        self.chunked = chunked
+        self.id = 1
+        self.queries = []
+
+    def get_member(self, user_id):
+        if user_id in self.members:
+            return SimpleNamespace(id=user_id, guild=self, roles=[SimpleNamespace(id=role_id) for role_id in self.members[user_id]])
+        return None
+
+    def get_role(self, role_id):
+        if role_id not in self.roles:
+            return None
+        return SimpleNamespace(members=[self.get_member(user_id) for user_id, roles in self.members.items() if role_id in roles])
+
+    async def query_members(self, user_ids, limit):
+        self.queries.append(list(user_ids))
+        return []
+
+
+def test_chunked_guild_does_not_query_departed_entrants():
+    cache = main.RoleEligibilityCache()
+    guild = FakeGuild({1: {10}, 2: {10, 20}}, {10, 20}, chunked=True)
+    entrants = {1, 2, 3, 4}
+    asyncio.run(cache.resolve(guild, entrants))
+    assert guild.queries == []
+    assert (cache.hits, cache.misses, cache.unresolved) == (2, 2, 2)
+    assert cache.holders(guild, entrants, 10) == {1, 2}
+    assert cache.holders(guild, entrants, 20) == {2}
+
+
+def test_unchunked_guild_queries_missing_members_in_batches():
+    cache = main.RoleEligibilityCache()
+    guild = FakeGuild({}, {10}, chunked=False)
+    entrants = set(range(1, main.MEMBER_QUERY_BATCH + 2))
+    asyncio.run(cache.resolve(guild, entrants))
+    assert [len(batch) for batch in guild.queries] == [main.MEMBER_QUERY_BATCH, 1]
+
+
+def test_entry_weights_add_each_bonus_role(monkeypatch):
+    cache = main.RoleEligibilityCache()
+    guild = FakeGuild({1: {10}, 2: {10, 20}}, {10, 20}, chunked=True)
+    monkeypatch.setattr(main, 'role_cache', cache)
+    weights = main.entry_weights(guild, [1, 2, 3], {10: 1, 20: 3})
+    assert list(weights) == [2, 5, 1]
+    assert cache.misses == 0
@@ -0,0 +1,108 @@
+"""Property checks for the winner samplers
+
+Draws use seeded RNGs; the statistical checks have wide enough bounds that
+they only fail when a sampler is biased.
+"""
+import random
+from array import array
+from collections import Counter
+
+import main
+
+
+def test_weighted_sampler_draws_every_entry_once():
+    rng = random.Random(7)
+    for _ in range(200):
+        weights = [rng.randint(0, 5) for _ in range(rng.randint(1, 60))]
+        sampler = main.WeightedSampler(weights)
+        drawn = [sampler.draw(rng) for _ in range(sum(1 for weight in weights if weight))]
+        assert sorted(drawn) == [position for position, weight in enumerate(weights) if weight]
+        assert sampler.total == 0
+
+
+def test_weighted_sampler_skips_removed_entries():
+    rng = random.Random(8)
+    for _ in range(200):
+        weights = [rng.randint(1, 5) for _ in range(rng.randint(2, 60))]
+        removed = set(rng.sample(range(len(weights)), len(weights) // 2))
+        sampler = main.WeightedSampler(weights)
+        for position in removed:
+            sampler.remove(position)
+        assert sampler.total == sum(weight for position, weight in enumerate(weights) if position not in removed)
+        drawn = set()
+        while sampler.total:
+            drawn.add(sampler.draw(rng))
+        assert drawn == set(range(len(weights))) - removed
+
+
+def test_weighted_sampler_is_proportional():
+    rng = random.Random(9)
+    weights = [1, 2, 3, 4]
+    counts = Counter(main.WeightedSampler(weights).draw(rng) for _ in range(40_000))
+    for position, weight in enumerate(weights):
+        assert abs(counts[position] / 40_000 - weight / sum(weights)) < 0.02
+
+
+def test_reservoir_sample_size_and_membership():
+    rng = random.Random(10)
+    for _ in range(500):
+        ids = list(range(rng.randint(0, 200)))
+        count = rng.randint(0, 50)
+        sample = main.reservoir_sample(iter(ids), count, rng)
+        assert len(sample) == min(count, len(ids))
+        assert len(set(sample)) == len(sample)
+        assert set(sample) <= set(ids)
+
+
+def test_reservoir_sample_is_uniform():
+    rng = random.Random(11)
+    counts = Counter()
+    for _ in range(20_000):
+        counts.update(main.reservoir_sample(range(20), 3, rng))
+    expected = 20_000 * 3 / 20
+    assert all(abs(counts[user_id] - expected) < expected * 0.1 for user_id in range(20))
+
+
+def test_draws_replay_from_their_seed():
+    entrant_ids = array('Q', range(1, 1001))
+    weights = array('Q', (1 + user_id % 4 for user_id in entrant_ids))
+    for draw_weights in (None, weights):
+        first, seed = main.new_draw_rng()
+        again, _ = main.new_draw_rng(seed)
+        assert main.draw_winners(entrant_ids, 10, first, draw_weights) == main.draw_winners(entrant_ids, 10, again, draw_weights)
+
+
+def test_draw_winners_respects_exclude():
+    rng = random.Random(12)
+    entrant_ids = array('Q', range(1, 51))
+    weights = array('Q', [2] * 50)
+    exclude = set(range(1, 41))
+    for draw_weights in (None, weights):
+        winners = main.draw_winners(entrant_ids, 20, rng, draw_weights, exclude=exclude)
+        assert sorted(winners) == list(range(41, 51))
+
+
+def test_redraw_winners_never_repeats_or_picks_excluded():
+    rng = random.Random(13)
+    for _ in range(300):
+        entrant_ids = array('Q', sorted(rng.sample(range(1, 10_000), rng.randint(1, 100))))
+        exclude = set(rng.sample(list(entrant_ids), rng.randint(0, len(entrant_ids))))
+        weights = [rng.randint(1, 4) for _ in entrant_ids]
+        cumulative = array('Q')
+        total = 0
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+        count = rng.randint(1, 20)
+        for pool in (None, cumulative):
+            winners = main.redraw_winners(entrant_ids, count, rng, pool, exclude=exclude)
+            assert len(winners) == len(set(winners)) == min(count, len(entrant_ids) - len(exclude))
+            assert not set(winners) & exclude
+            assert set(winners) <= set(entrant_ids)
+
+
+def test_redraw_winners_caps_count_at_the_pool():
+    rng = random.Random(14)
+    entrant_ids = array('Q', [1, 2, 3, 4])
+    assert sorted(main.redraw_winners(entrant_ids, 2_000_000, rng)) == [1, 2, 3, 4]
+    assert main.redraw_winners(entrant_ids, 2_000_000, rng, exclude={1, 2, 3, 4}) == []